@@ -15,12 +15,11 @@ bl_info = {
 }
 import bpy
 import gpu
-
-from gpu_extras.batch import batch_for_shader
+from math import sin, cos
 
 from .bpy_ctypes import get_running_op
-from .utility import change_checker, dorot, printc, try_def, bool_or, get_by_area
-from .effect_fcurve import effectC, fcurveC
+from .utility import change_checker, printc, try_def, bool_or, get_by_area, selected_strips
+from .effect_fcurve import effectC, effect_record, fcurveC, recalc_queue
 from .sve_struct import sve, anim_base
 from .operators import \
     SVEEffects_AddEffect,\
@@ -31,9 +30,22 @@ from .operators import \
     SVEEffects_AddEffect_StartEnd, \
     SEQUENCER_PT_SVE_topforce, \
     SEQUENCER_PT_SVEEffects,\
+    SEQUENCER_PT_SVEProfiler,\
+    SVEEffects_Profiler,\
     SEQUENCER_MT_SVEEffects_startend, \
-    lock_tempscene
+    lock_tempscene, \
+    find_session, \
+    mark_session, \
+    parse_effects, \
+    store_effect_records
+from .presets import \
+    SVEEffects_PresetSave, \
+    SVEEffects_PresetApply, \
+    SVEEffects_PresetTransfer, \
+    SEQUENCER_MT_SVEEffects_Presets
 from .globals import G
+from .scheduler import scheduler
+from .profiler import profiler
 
 
 def remove_strip(name: str):
@@ -42,7 +54,9 @@ def remove_strip(name: str):
         for fcurve in effect.fcurves:
             fcurve.remove_effect(effect)
         del effectC.all[name]
+        effectC.index.remove(effect)
     G.strips.remove(name)
+    G.handles.invalidate()
 
 def add_strip(name):
     strip = G.edit_scene.sequence_editor.sequences[name]
@@ -52,6 +66,7 @@ def add_strip(name):
         G.strips.add(name)
 
 # if an effect strip gets deleted/undeleted or non-effect strip is added/deleted, this keeps track
+@profiler.timed
 def check_strip_ledger():
     if G.edit_strip == None or bpy.context.scene != G.edit_scene: return
 
@@ -70,7 +85,7 @@ def check_strip_ledger():
         for seq in seqname:
             if seq not in G.strips:
                 add_strip(seq)
-    fcurveC.recalc_all()
+    fcurveC.recalc_all(sliced=True)
 
     with bpy.context.temp_override(area=SEQUENCE_EDITOR):
         bpy.ops.ed.flush_edits()
@@ -79,6 +94,7 @@ class check_effect_prop_change:
     effect_check: change_checker = change_checker()
     prop_check: dict[str, change_checker] = {}
 
+    @profiler.timed
     def __call__(self):
         strip = bpy.context.active_sequence_strip
         if not strip or strip.name not in effectC.all: return
@@ -109,15 +125,15 @@ class check_running_op:
                 is_change = is_change or bool_or([effect in fc.effects for fc in fcurves])
             if is_change:
                 for upath in usages:
-                    fcurveC.all[upath].keyframes_value_recalc()
+                    fcurveC.all[upath].recalc_request('keyframes')
                     
             self.frame_update()
         return doer
 
     def transform_frame(self):
         def doer(doer_effects: list[effectC]):
-            fcurves = {fcurve for effect in doer_effects for fcurve in effect.fcurves}
-            for fc in fcurves: fc.frame_recalc()
+            for effect in doer_effects:
+                effect.frames_changed()
             self.frame_update()
         return doer
 
@@ -136,6 +152,7 @@ class check_running_op:
             'SEQUENCER_OT_slip': self.transform_frame(),
         }
 
+    @profiler.timed
     def __call__(self):
         def update_effect_on(op_idname: str, effects: list[effectC]):
             # printc(op_idname)
@@ -152,10 +169,10 @@ class check_running_op:
             if path:
                 for upath in sve.props[path].use:
                     if upath in fcurveC.all:
-                        fcurveC.all[upath].if_not_on_fcurve()
+                        fcurveC.all[upath].recalc_request('on_fcurve')
         
-        effects = [effectC.all[seq] for seq in effectC.all if effectC.all[seq].effect.select]
-        if len(effects) == 0 and not G.edit_strip.select: return
+        effects = [effectC.all[strip.name] for strip in selected_strips(bpy.context) if strip.name in effectC.all]
+        if len(effects) == 0 and not G.edit_strip.select: return False
 
         idname = get_running_op(bpy.context.window)
         
@@ -164,22 +181,93 @@ class check_running_op:
             update_effect_on(old_value, effects)
             if G.edit_strip.select:
                 update_edit_strip(old_value)
+            recalc_queue.tick()
         if idname:
             update_effect_on(idname, effects)
+        # keep polling until the operator finishes
+        return idname != None
 check_running_op = check_running_op()
 
-def draw_callback_seq_preview():
-    if G.edit_strip == None or bpy.context.scene != G.edit_scene: return
-    
-    check_strip_ledger()
-    check_effect_prop_change()
-    check_running_op()
-    strip = bpy.context.active_sequence_strip
-    if strip and strip.select and sve.type in strip and 'transform' in strip[sve.type]:
-        region = bpy.context.region
+scheduler.add_check('strips', check_strip_ledger)
+scheduler.add_check('props', check_effect_prop_change)
+scheduler.add_check('running_op', check_running_op)
+scheduler.add_check('recalc', recalc_queue.tick)
+scheduler.add_check('materialize', effect_record.materialize_view)
+scheduler.add_check('lazy', store_effect_records)
 
-        if not(G.edit_scene.frame_current >= strip.frame_final_start and 
-            G.edit_scene.frame_current < strip.frame_final_end): return
+@bpy.app.handlers.persistent
+def depsgraph_update(scene, depsgraph):
+    G.handles.invalidate()
+    G.paths.clear()
+    if G.edit_strip == None or scene != G.edit_scene: return
+    preview_overlay.touch()
+    scheduler.mark('strips', 'props', 'running_op')
+
+# frame changes only matter while scrubbing, playback has no modal operator
+@bpy.app.handlers.persistent
+def frame_change(scene, depsgraph):
+    if G.edit_strip == None or scene != G.edit_scene: return
+    window = scheduler.edit_window()
+    if window and get_running_op(window):
+        scheduler.mark('running_op')
+
+# undo/redo reallocates the scenes and strips, every handle is stale
+@bpy.app.handlers.persistent
+def undo_redo(scene, *args):
+    G.handles.invalidate()
+    G.paths.clear()
+    effectC.reindex()
+    fcurveC.forget_all()
+    fcurveC.recalc_all(sliced=True)
+    preview_overlay.clear()
+
+# a new file, the session is found again by reinstate
+@bpy.app.handlers.persistent
+def loader(file):
+    G.handles.invalidate()
+    G.paths.clear()
+    preview_overlay.clear()
+    reinstate()
+
+msgbus_owner = object()
+def subscribe_active_strip():
+    bpy.msgbus.clear_by_owner(msgbus_owner)
+    bpy.msgbus.subscribe_rna(
+        key=(bpy.types.SequenceEditor, 'active_strip'),
+        owner=msgbus_owner, args=(1,),
+        notify=lambda *args: scheduler.mark('props', 'materialize') )
+
+# outline corners in view space per strip, keyed by frame and revision. the revision is bumped by any depsgraph
+# update of the edit scene (props, crop), undo and fcurve writes. region positions are not cached, the view pans.
+# the outlines of all selected strips are drawn as one LINES batch. python vertex buffers are static, blender
+# frees their data once drawn, so the batch is only reused while the lines are the same and built again otherwise
+class preview_overlay:
+    revision: int = 0
+    corners: dict[str, tuple[tuple, list]]
+    hits: int = 0
+    misses: int = 0
+    shader = None
+    format = None
+    batch = None
+    lines: list[tuple[float, float]] = None
+
+    def __init__(self) -> None:
+        self.corners = {}
+
+    def touch(self):
+        self.revision += 1
+
+    def clear(self):
+        self.corners.clear()
+        self.touch()
+
+    def strip_corners(self, strip) -> list[tuple[float, float]]:
+        key = (G.edit_scene.frame_current, self.revision, fcurveC.revisions)
+        cached = self.corners.get(strip.name)
+        if cached != None and cached[0] == key:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
 
         if strip.type in ['IMAGE','MOVIE'] and len(strip.elements) > 0:
             resxhalf = float(strip.elements[0].orig_width) / 2.0
@@ -193,42 +281,80 @@ def draw_callback_seq_preview():
         scax = strip[sve.scale_x]
         scay = strip[sve.scale_y]
         rota = strip[sve.rotation]
-        crop_min_x = strip.crop.min_x
-        crop_min_y = strip.crop.min_y
-        crop_max_x = strip.crop.max_x
-        crop_max_y = strip.crop.max_y
+        crop = strip.crop
 
         # 1--2
         # |  |
         # |  |
         # 0--3
         xp = [
-            offx + (- resxhalf + crop_min_x ) * scax,
-            offx + (- resxhalf + crop_min_x ) * scax,
-            offx + (+ resxhalf - crop_max_x ) * scax,
-            offx + (+ resxhalf - crop_max_x ) * scax,
+            offx + (- resxhalf + crop.min_x ) * scax,
+            offx + (- resxhalf + crop.min_x ) * scax,
+            offx + (+ resxhalf - crop.max_x ) * scax,
+            offx + (+ resxhalf - crop.max_x ) * scax,
         ]
         yp = [
-            offy + (- resyhalf + crop_min_y ) * scay,
-            offy + (+ resyhalf - crop_max_y ) * scay,
-            offy + (+ resyhalf - crop_max_y ) * scay,
-            offy + (- resyhalf + crop_min_y ) * scay,
+            offy + (- resyhalf + crop.min_y ) * scay,
+            offy + (+ resyhalf - crop.max_y ) * scay,
+            offy + (+ resyhalf - crop.max_y ) * scay,
+            offy + (- resyhalf + crop.min_y ) * scay,
         ]
 
-        dots = []
-        for ii in range(4):
-            dots.append( region.view2d.view_to_region(*dorot(xp[ii], yp[ii], rota),clip=False) )
-        dots.append( region.view2d.view_to_region(*dorot(xp[0], yp[0], rota),clip=False) )
+        ss, cc = sin(rota), cos(rota)
+        corners = [(xx * cc - yy * ss, xx * ss + yy * cc) for xx, yy in zip(xp, yp)]
+        self.corners[strip.name] = (key, corners)
+        return corners
+
+    def draw(self, lines: list[tuple[float, float]]):
+        if self.shader == None:
+            self.shader = gpu.shader.from_builtin('UNIFORM_COLOR')
+            # the builtin's pos is a vec3 since 3.4, the outlines are 2d
+            self.format = gpu.types.GPUVertFormat()
+            self.format.attr_add(id='pos', comp_type='F32', len=2, fetch_mode='FLOAT')
+        if self.batch == None or self.lines != lines:
+            vbo = gpu.types.GPUVertBuf(self.format, len(lines))
+            vbo.attr_fill('pos', lines)
+            self.batch = gpu.types.GPUBatch(type='LINES', buf=vbo)
+            self.lines = lines
 
-        shader = gpu.shader.from_builtin('UNIFORM_COLOR')
         gpu.state.blend_set('ALPHA')
         gpu.state.line_width_set(1.5)
-        batch = batch_for_shader(shader, 'LINE_STRIP', {"pos": dots})
-        shader.uniform_float("color", (1.0, 1.0, 1.0, .1))
-        batch.draw(shader)
-
+        self.shader.uniform_float("color", (1.0, 1.0, 1.0, .1))
+        self.batch.draw(self.shader)
         gpu.state.line_width_set(1.0)
         gpu.state.blend_set('NONE')
+preview_overlay = preview_overlay()
+
+@profiler.timed
+def draw_callback_seq_preview():
+    if G.edit_strip == None or bpy.context.scene != G.edit_scene: return
+    
+    frame = G.edit_scene.frame_current
+    region = bpy.context.region
+    view_to_region = region.view2d.view_to_region
+    lines = []
+    for strip in selected_strips(bpy.context) or []:
+        if not (sve.type in strip and 'transform' in strip[sve.type]): continue
+        if not (frame >= strip.frame_final_start and frame < strip.frame_final_end): continue
+
+        dots = [view_to_region(xx, yy, clip=False) for xx, yy in preview_overlay.strip_corners(strip)]
+        for ii in range(4):
+            lines += [dots[ii], dots[(ii + 1) % 4]]
+    if lines:
+        preview_overlay.draw(lines)
+
+
+# only notes the visible frames, effect records in view are materialized by the scheduler
+# and the sliced recalc does the fcurves of the effects in view first
+@profiler.timed
+def draw_callback_seq_timeline():
+    if G.edit_strip == None or bpy.context.scene != G.edit_scene: return
+    region = bpy.context.region
+    start, _ = region.view2d.region_to_view(0, 0)
+    end, _ = region.view2d.region_to_view(region.width, 0)
+    effect_record.view = (start, end)
+    if len(effect_record.all) > 0 and effect_record.in_view(start, end):
+        scheduler.mark('materialize')
 
 
 def effects_scene_menu(self, context):
@@ -240,6 +366,7 @@ def main_scene_menu(self, context):
     if G.edit_strip == None:
         if context.active_sequence_strip and context.active_sequence_strip.type in acceptable_types:
             self.layout.operator(SVEEffects_OpenEditor.bl_idname, text =SVEEffects_OpenEditor.bl_label)
+            self.layout.menu(SEQUENCER_MT_SVEEffects_Presets.bl_idname, text=SEQUENCER_MT_SVEEffects_Presets.bl_label)
     else:
         self.layout.operator(SVEEffects_CloseEditor.bl_idname, text =SVEEffects_CloseEditor.bl_label)
 
@@ -252,55 +379,68 @@ def add_handle(space, *args):
     
     return removefun
 
+@profiler.timed
 def reinstate():
+    scheduler.clear()
+    recalc_queue.clear()
+    subscribe_active_strip()
     G.edit_strip = None
     G.orig_strip = None
     G.strips.clear()
-    effectC.all.clear()
+    effectC.clear()
+    effect_record.clear()
     fcurveC.all.clear()
     
-    for scene in bpy.data.scenes:
-        if scene.sequence_editor == None: continue
-        for strip in scene.sequence_editor.sequences:
-            if strip.channel == 2 and sve.strip_source in strip:
-                if strip[sve.strip_source] in scene.sequence_editor.sequences_all:
-                    G.edit_strip = strip.name
-                    G.edit_scene = scene.name
-                    G.orig_strip = strip[sve.strip_source]
-
-                    if scene.animation_data == None:
-                        scene.animation_data_create()
-                    if scene.animation_data.action == None:
-                        bpy.data.actions.new(scene.name)
-                        scene.animation_data.action = bpy.data.actions[scene.name]
-                    
-
-                    for fc in list(G.action.fcurves):
-                        if '"%s"'%(G.orig_strip.name) in fc.data_path or '"%s"'%(G.edit_strip.name) in fc.data_path:
-                            G.action.fcurves.remove(fc)
-
-                    lock_tempscene()
-
-                    SEQUENCE_EDITOR = get_by_area("SEQUENCE_EDITOR")
-
-                    with bpy.context.temp_override(area=SEQUENCE_EDITOR):
-                        for strip0 in G.edit_scene.sequence_editor.sequences:
-                            strip0.select = False
-                        G.edit_strip.select = True
-                        bpy.ops.sequencer.set_range_to_strips(preview=True)
+    session = find_session()
+    if session == None:
+        mark_session()
+    else:
+        scene, strip = session
+        G.edit_strip = strip.name
+        G.edit_scene = scene.name
+        G.orig_strip = strip[sve.strip_source]
+        mark_session(scene.name, strip.name)
+
+        if scene.animation_data == None:
+            scene.animation_data_create()
+        if scene.animation_data.action == None:
+            bpy.data.actions.new(scene.name)
+            scene.animation_data.action = bpy.data.actions[scene.name]
+        
 
-                    for strip0 in G.edit_scene.sequence_editor.sequences:
-                        add_strip(strip0.name)
-                    fcurveC.recalc_all()
-                    return
+        G.paths.remove(scene, 'fcurves', G.orig_strip.name, G.edit_strip.name)
+
+        lock_tempscene()
+
+        SEQUENCE_EDITOR = get_by_area("SEQUENCE_EDITOR")
+
+        with bpy.context.temp_override(area=SEQUENCE_EDITOR):
+            for strip0 in G.edit_scene.sequence_editor.sequences:
+                strip0.select = False
+            G.edit_strip.select = True
+            bpy.ops.sequencer.set_range_to_strips(preview=True)
+
+        for strip0 in G.edit_scene.sequence_editor.sequences:
+            add_strip(strip0.name)
+        if sve.effect_store in G.edit_strip:
+            try:
+                for name, parsed in parse_effects(G.edit_strip[sve.effect_store], 0):
+                    if name not in G.edit_scene.sequence_editor.sequences:
+                        effect_record(name, parsed)
+            except ValueError as e:
+                printc(str(e))
+        fcurveC.recalc_all(sliced=True)
+        return
         
     add_handle(bpy.types.SpaceSequenceEditor, draw_callback_seq_preview, tuple(), 'PREVIEW', 'POST_PIXEL' )
+    add_handle(bpy.types.SpaceSequenceEditor, draw_callback_seq_timeline, tuple(), 'WINDOW', 'POST_PIXEL' )
 
 
 
 classes = [
     SEQUENCER_PT_SVE_topforce,
     SEQUENCER_PT_SVEEffects,
+    SEQUENCER_PT_SVEProfiler,
     SEQUENCER_MT_SVEEffects_startend,
     SVEEffects_AddEffect,
     SVEEffects_AddEffect_StartEnd,
@@ -308,6 +448,11 @@ classes = [
     SVEEffects_CloseEditor,
     SEQUENCER_MT_SVEEffects_Menu,
     SVEEffects_Tester,
+    SVEEffects_Profiler,
+    SVEEffects_PresetSave,
+    SVEEffects_PresetApply,
+    SVEEffects_PresetTransfer,
+    SEQUENCER_MT_SVEEffects_Presets,
     ]
 
 
@@ -316,20 +461,24 @@ def register():
         bpy.utils.register_class(cl)
     bpy.types.SEQUENCER_MT_editor_menus.append(effects_scene_menu)
     bpy.types.SEQUENCER_MT_editor_menus.append(main_scene_menu)
+    bpy.app.handlers.depsgraph_update_post.append(depsgraph_update)
+    bpy.app.handlers.frame_change_post.append(frame_change)
+    bpy.app.handlers.undo_post.append(undo_redo)
+    bpy.app.handlers.redo_post.append(undo_redo)
+    bpy.app.handlers.load_post.append(loader)
     bpy.app.timers.register(reinstate, first_interval=0.1, persistent= False)
 
 def unregister():
     for hh in handles: hh()
     handles.clear()
+    scheduler.clear()
+    bpy.msgbus.clear_by_owner(msgbus_owner)
+    bpy.app.handlers.depsgraph_update_post.remove(depsgraph_update)
+    bpy.app.handlers.frame_change_post.remove(frame_change)
+    bpy.app.handlers.undo_post.remove(undo_redo)
+    bpy.app.handlers.redo_post.remove(undo_redo)
+    bpy.app.handlers.load_post.remove(loader)
     bpy.types.SEQUENCER_MT_editor_menus.remove(effects_scene_menu)
     bpy.types.SEQUENCER_MT_editor_menus.remove(main_scene_menu)
     for cl in classes:
         bpy.utils.unregister_class(cl)
-
-@bpy.app.handlers.persistent
-def loader(file):
-    reinstate()
-
-
-bpy.app.handlers.load_post.append(loader)
-
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+import bpy
+import sys
+import importlib
+import numpy as np
+from os import path, cpu_count
+from zlib import crc32
+from fnmatch import fnmatchcase
+from multiprocessing import get_context
+from concurrent.futures import ProcessPoolExecutor
+from .sve_struct import sve, anim_base
+from .effect_fcurve import effectC, effect_record, fcurveC, recalc_queue
+from .operators import dump_effects, load_effects
+from .scheduler import scheduler
+from .sve_math import bake_strip
+from .utility import get_from_path, keyframes_from_co, bake_noise
+from .globals import G
+
+addon_dir = path.dirname(path.abspath(__file__))
+
+# headless effect application, the effects are evaluated as effect records against the strip itself
+# so the keyframes and modifiers land on its fcurves without a temp scene, meta strip or proxy image.
+# a spec is {'type', 'start', 'end', 'props', 'name'}, start/end relative to the strip start,
+# end defaults to the end of the strip and props are in the effect store format {prop: [start, end]}
+# noise_step > 0 bakes the shake noise modifiers into keyframes sampled every noise_step frames
+
+def effect_from_spec(spec: dict, strip, names: set[str]) -> tuple[str, dict]:
+    if spec.get('type') not in anim_base.all:
+        raise ValueError('unknown effect type %r, expected one of %s' % (spec.get('type'), ', '.join(anim_base.all)))
+    offset = strip.frame_final_start
+    start = spec.get('start', 0) + offset
+    end = spec.get('end', strip.frame_final_duration) + offset
+    for prop in spec.get('props', {}):
+        if prop not in sve.props:
+            raise ValueError('unknown effect property %r' % prop)
+
+    name = spec.get('name')
+    if name == None or name in names:
+        base = spec.get('name', anim_base.all[spec['type']].name)
+        index = 1
+        while '%s.%03d' % (base, index) in names: index += 1
+        name = '%s.%03d' % (base, index)
+    names.add(name)
+    return name, {
+        'type': spec['type'],
+        'start': start,
+        'end': end,
+        'props': {prop: list(value) for prop, value in spec.get('props', {}).items()},
+    }
+
+def reset_state():
+    effectC.clear()
+    effect_record.clear()
+    fcurveC.all.clear()
+    recalc_queue.clear()
+    scheduler.clear()
+    G.strips.clear()
+    G.edit_strip = None
+    G.orig_strip = None
+    G.edit_scene = None
+
+def apply_effects(scene, strip, effects: list[tuple[str, dict]], noise_step: int = 0) -> int:
+    offset = strip.frame_final_start
+    reset_state()
+    try:
+        G.edit_scene = scene.name
+        G.edit_strip = strip.name
+        G.orig_strip = strip.name
+
+        clear_strip_fcurves(scene, strip)
+        for name, parsed in effects:
+            effect_record(name, parsed)
+        fcurveC.recalc_all()
+        if noise_step > 0:
+            for fcurve in fcurveC.all.values(): bake_noise(fcurve.fcurve, noise_step)
+        store_effects(strip, effect_record.all.values())
+        bpy.msgbus.clear_by_owner(strip)
+    finally:
+        reset_state()
+    return len(effects)
+
+def clear_strip_fcurves(scene, *strips):
+    if scene.animation_data == None:
+        scene.animation_data_create()
+    if scene.animation_data.action == None:
+        scene.animation_data.action = bpy.data.actions.new(scene.name)
+    # one pass over the action for all strips, the data path starts with the strip path
+    prefixes = tuple(strip.path_from_id() for strip in strips)
+    fcurves = scene.animation_data.action.fcurves
+    for fc in list(fcurves):
+        if fc.data_path.startswith(prefixes):
+            fcurves.remove(fc)
+
+def store_effects(strip, effects):
+    props = strip.id_properties_ensure().to_dict()
+    for pp in props:
+        if pp[:len(sve.effect_pre)] == sve.effect_pre:
+            del strip[pp]
+    strip[sve.effect_store] = dump_effects(effects, strip.frame_final_start)
+
+# manifest: {'scene': name (optional), 'strips': {strip name or fnmatch pattern: [spec, ...]}}
+# a strip matched by several patterns gets the effects of all of them
+def manifest_effects(manifest: dict, replace: bool = False) -> tuple[object, dict[str, tuple[object, list]]]:
+    if G.edit_strip != None:
+        raise RuntimeError('the effects editor is open, close it before applying effects in batch')
+    scene = bpy.data.scenes[manifest['scene']] if 'scene' in manifest else bpy.context.scene
+    if scene.sequence_editor == None:
+        raise ValueError('scene %r has no sequencer strips' % scene.name)
+
+    # only top level strips, the fcurve engine resolves its strip in sequences
+    strips = {strip.name: strip for strip in scene.sequence_editor.sequences}
+    targets: dict[str, tuple[object, list]] = {}
+    for pattern, specs in manifest['strips'].items():
+        matched = [pattern] if pattern in strips else [name for name in strips if fnmatchcase(name, pattern)]
+        if len(matched) == 0:
+            raise KeyError('no strip matches %r in scene %r' % (pattern, scene.name))
+        for name in matched:
+            strip = strips[name]
+            if name not in targets:
+                targets[name] = (strip, [] if replace else load_effects(strip, strip.frame_final_start))
+            effects = targets[name][1]
+            names = {name for name, _ in effects}
+            effects += [effect_from_spec(spec, strip, names) for spec in specs]
+    return scene, targets
+
+def apply_manifest(manifest: dict, replace: bool = False, noise_step: int = 0) -> dict[str, int]:
+    scene, targets = manifest_effects(manifest, replace)
+    return {name: apply_effects(scene, strip, effects, noise_step) for name, (strip, effects) in targets.items()}
+
+
+# baking, the effects are reduced to plain ranges per fcurve in blender, the keyframes are summed
+# in worker processes and written back in one pass. modifiers are not numeric and stay in blender
+
+class bake_job:
+    strip: object
+    records: list[effect_record]
+    ranges: dict[str, tuple[list, list, list, list]]
+    modifiers: dict[str, list[effect_record]]
+
+    def __init__(self, strip, effects: list[tuple[str, dict]]) -> None:
+        # G.edit_strip has to be the strip, effect defaults are read from it
+        self.strip = strip
+        self.records = [effect_record(name, parsed, attach=False) for name, parsed in effects]
+        self.ranges = {}
+        self.modifiers = {}
+        for record in self.records:
+            is_modifier = bool(record.modifier)
+            for sve_path in record.uses():
+                columns = self.ranges.setdefault(sve_path, ([], [], [], []))
+                if is_modifier:
+                    self.modifiers.setdefault(sve_path, []).append(record)
+                    continue
+                val0, val1 = record.get_values(sve_path)
+                for column, value in zip(columns, (record.start, record.end, val0, val1)):
+                    column.append(value)
+
+    def write(self, scene, baked: dict[str, np.ndarray], noise_step: int = 0):
+        strip = self.strip
+        fcurves = scene.animation_data.action.fcurves
+        for sve_path, co in baked.items():
+            path = sve.props[sve_path].path
+            fcurve = fcurves.new(get_from_path(strip, path, lambda base, prop: base.path_from_id(prop)))
+            modifiers = sorted(self.modifiers.get(sve_path, []), key=lambda record: (record.start, record.end))
+            if len(co) == 0 and len(modifiers) > 0:
+                co = np.array([strip.frame_start, get_from_path(strip, path, lambda base, prop: getattr(base, prop))],
+                              dtype=np.float32)
+            keyframes_from_co(fcurve.keyframe_points, co)
+            fcurve.keyframe_points.sort()
+
+            G.set_random = crc32(fcurve.data_path.encode())
+            for record in modifiers:
+                modifier = fcurve.modifiers.new(record.modifier['type'])
+                record.atype.to_modifier(modifier, record)
+                modifier.frame_start = record.start
+                modifier.frame_end = record.end
+            if noise_step > 0:
+                bake_noise(fcurve, noise_step)
+        store_effects(strip, self.records)
+
+def worker_math():
+    # the workers can't import the addon package (its __init__ imports bpy), they get sve_math
+    # as a top level module. spawned processes inherit sys.path
+    if addon_dir not in sys.path: sys.path.append(addon_dir)
+    return importlib.import_module('sve_math')
+
+def bake_all(tasks: list[tuple[str, dict]], workers: int = None) -> list[tuple[str, dict]]:
+    if workers == 1 or len(tasks) < 2:
+        return [bake_strip(task) for task in tasks]
+    workers = workers or cpu_count() or 1
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+        return list(pool.map(worker_math().bake_strip, tasks, chunksize=chunksize))
+
+def bake_manifest(manifest: dict, replace: bool = False, workers: int = None, noise_step: int = 0) -> dict[str, int]:
+    scene, targets = manifest_effects(manifest, replace)
+    jobs: dict[str, bake_job] = {}
+    reset_state()
+    try:
+        G.edit_scene = scene.name
+        for name, (strip, effects) in targets.items():
+            G.edit_strip = name
+            jobs[name] = bake_job(strip, effects)
+    finally:
+        reset_state()
+
+    baked = bake_all([(name, job.ranges) for name, job in jobs.items()], workers)
+
+    try:
+        G.edit_scene = scene.name
+        clear_strip_fcurves(scene, *(job.strip for job in jobs.values()))
+        for name, arrays in baked:
+            G.edit_strip = name
+            jobs[name].write(scene, arrays, noise_step)
+    finally:
+        reset_state()
+    return {name: len(job.records) for name, job in jobs.items()}
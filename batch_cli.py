@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+# Applies a manifest of effects to the strips of a .blend file, not loaded by blender as part of the addon.
+#   blender -b project.blend --python batch_cli.py -- manifest.json [--replace] [--workers N] [--bake-noise STEP] [--output out.blend]
+# manifest.json:
+#   {"scene": "Scene", "strips": {"clip_*.mp4": [{"type": "anim_transform", "start": 0, "end": 120,
+#       "props": {"use_scale": [true], "scale_x": [1.0, 1.2], "scale_y": [1.0, 1.2]}}]}}
+# start/end are relative to the strip start, the prop names are the ones of the effect store.
+
+import sys
+import json
+import types
+import argparse
+import importlib
+from os import path
+from time import perf_counter
+
+addon_dir = path.dirname(path.abspath(__file__))
+package_name = 'sve_batch'
+
+
+def load_module(name: str):
+    # the addon modules use relative imports, load them without running __init__ (register, handlers)
+    if package_name not in sys.modules:
+        package = types.ModuleType(package_name)
+        package.__path__ = [addon_dir]
+        sys.modules[package_name] = package
+    return importlib.import_module(package_name + '.' + name)
+
+def main(args: list[str]) -> int:
+    import bpy
+    parser = argparse.ArgumentParser(prog='batch_cli.py', description='apply effects to strips headless')
+    parser.add_argument('manifest', help='json manifest of strip names/patterns to effect specs')
+    parser.add_argument('--replace', action='store_true', help='drop the effects already stored on the strips')
+    parser.add_argument('--workers', type=int, help='bake processes, defaults to the cpu count, 1 bakes in blender')
+    parser.add_argument('--bake-noise', type=int, default=0, metavar='STEP',
+                        help='replace the shake noise modifiers with keyframes every STEP frames')
+    parser.add_argument('--output', help='.blend to save to, defaults to the loaded file')
+    args = parser.parse_args(args)
+
+    with open(args.manifest) as file:
+        manifest = json.load(file)
+    batch = load_module('batch')
+
+    tt = perf_counter()
+    try:
+        applied = batch.bake_manifest(manifest, args.replace, args.workers, args.bake_noise)
+    except (KeyError, ValueError, RuntimeError) as e:
+        print('sve batch: %s' % e, file=sys.stderr)
+        return 1
+    tt = perf_counter() - tt
+    for name, count in applied.items():
+        print('  %-40s %3d effects' % (name, count))
+    print('sve batch: %d strips in %.2f s' % (len(applied), tt))
+
+    output = args.output or bpy.data.filepath
+    if output:
+        bpy.ops.wm.save_as_mainfile(filepath=output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]))
@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+
+# Benchmarks for the effect/fcurve engine, not loaded by blender as part of the addon.
+# Without bpy the engine runs against bpy_stand_in, inside blender against the real API.
+#   python benchmark.py [sizes ...]
+#   blender -b --python benchmark.py -- [sizes ...]
+#   python benchmark.py --import    time one import of the addon package with its __init__
+
+import sys
+import json
+import types
+import random
+import importlib
+import importlib.util
+import subprocess
+import tracemalloc
+from os import path
+from time import perf_counter
+
+addon_dir = path.dirname(path.abspath(__file__))
+package_name = 'sve_benchmark'
+sizes = [10, 100, 1000, 10000]
+
+
+def bpy_stand_in() -> bool:
+    try:
+        import bpy
+        return getattr(bpy, '__stand_in__', False)
+    except ImportError:
+        pass
+    sys.path.insert(0, addon_dir)
+    from bpy_stand_in import install
+    install()
+    return True
+
+def load_module(name: str):
+    # the addon modules use relative imports, load them without running __init__ (register, handlers)
+    if package_name not in sys.modules:
+        package = types.ModuleType(package_name)
+        package.__path__ = [addon_dir]
+        sys.modules[package_name] = package
+    return importlib.import_module(package_name + '.' + name)
+
+def import_addon() -> dict:
+    # runs in a fresh interpreter, __init__ is executed like blender does when enabling the addon
+    bpy_stand_in()
+    tt = perf_counter()
+    spec = importlib.util.spec_from_file_location(
+        package_name, path.join(addon_dir, '__init__.py'), submodule_search_locations=[addon_dir])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[package_name] = package
+    spec.loader.exec_module(package)
+    tt = perf_counter() - tt
+    ctypes = sys.modules[package_name + '.bpy_ctypes']
+    return {'time': tt, 'numpy': 'numpy' in sys.modules, 'structs': len(ctypes.StructBase._structs) == 0}
+
+def import_time(repeat: int = 5) -> dict:
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, path.abspath(__file__), '--import'],
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.splitlines()[-1])
+        best = result if best is None or result['time'] < best['time'] else best
+    return best
+
+def timeit(call, repeat: int = 3) -> float:
+    best = None
+    for _ in range(repeat):
+        tt = perf_counter()
+        call()
+        tt = perf_counter() - tt
+        best = tt if best is None or tt < best else best
+    return best
+
+def measure(call, repeat: int = 3) -> tuple[float, int]:
+    tt = timeit(call, repeat)
+    tracemalloc.start()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tt, peak
+
+def report(name: str, count: int, tt: float, peak: int):
+    print('  %-34s %6d  %10.3f ms  %8.2f us/effect  %9.1f KiB peak' % (
+        name, count, tt * 1000.0, tt * 1e6 / count, peak / 1024.0))
+
+
+class session:
+    # a synthetic edit session, long form timeline of effects 10 to 60 frames long
+    # with a density of about 4 overlapping effects, a few of them shakes
+    def __init__(self, count: int, seed: int = 0, shake_ratio: float = 0.05) -> None:
+        import bpy
+        G = load_module('globals').G
+        effect_fcurve = load_module('effect_fcurve')
+        effectC, fcurveC = effect_fcurve.effectC, effect_fcurve.fcurveC
+        sve = load_module('sve_struct').sve
+
+        effectC.clear()
+        fcurveC.all.clear()
+        effect_fcurve.recalc_queue.clear()
+        G.strips.clear()
+
+        span = count * 10
+        scene = self.scene = bpy.data.scenes.new('SVE_benchmark')
+        scene.sequence_editor_create()
+        scene.animation_data_create()
+        scene.animation_data.action = bpy.data.actions.new(scene.name)
+        edit = scene.sequence_editor.sequences.new_effect(
+            'SVE_benchmark_edit', 'COLOR', 2, frame_start=1, frame_end=span + 100)
+        G.edit_scene = scene.name
+        G.edit_strip = edit.name
+        G.orig_strip = edit.name
+
+        rand = random.Random(seed)
+        for ii in range(count):
+            start = rand.randint(1, span)
+            props = {'start': start, 'end': start + rand.randint(10, 60)}
+            if rand.random() < shake_ratio:
+                props['type'] = 'anim_shake'
+            else:
+                props['type'] = 'anim_transform'
+                props['props'] = {
+                    sve.use_offset: [True], sve.use_scale: [True], sve.use_rotation: [True],
+                    sve.offset_x: [rand.uniform(-100, 100), rand.uniform(-100, 100)],
+                    sve.offset_y: [rand.uniform(-100, 100), rand.uniform(-100, 100)],
+                    sve.scale_x: [rand.uniform(0.5, 2.0), rand.uniform(0.5, 2.0)],
+                    sve.scale_y: [rand.uniform(0.5, 2.0), rand.uniform(0.5, 2.0)],
+                    sve.rotation: [rand.uniform(-1, 1), rand.uniform(-1, 1)],
+                }
+            effectC('sve_effect_%05d' % ii, scene, props)
+        fcurveC.recalc_all()
+
+    def close(self):
+        import bpy
+        G = load_module('globals').G
+        effect_fcurve = load_module('effect_fcurve')
+        effect_fcurve.effectC.clear()
+        effect_fcurve.fcurveC.all.clear()
+        effect_fcurve.recalc_queue.clear()
+        G.strips.clear()
+        G.edit_strip = None
+        G.orig_strip = None
+        G.edit_scene = None
+        action = self.scene.animation_data.action
+        bpy.data.scenes.remove(self.scene)
+        bpy.data.actions.remove(action)
+
+
+def bench_load(count: int, scenes: int = 10):
+    # a project of several scenes with count strips each, the open session is in the last one
+    import bpy
+    operators = load_module('operators')
+    sve = load_module('sve_struct').sve
+
+    created = []
+    for ii in range(scenes):
+        scene = bpy.data.scenes.new('SVE_load_%02d' % ii)
+        scene.sequence_editor_create()
+        for jj in range(count):
+            scene.sequence_editor.sequences.new_effect('strip_%05d' % jj, 'COLOR', 1 + jj % 3, frame_start=1 + jj)
+        created.append(scene)
+    sequences = created[-1].sequence_editor.sequences
+    sequences[-1][sve.strip_source] = sequences[0].name
+    sequences[-1].channel = 2
+
+    operators.mark_session(created[-1].name, sequences[-1].name)
+    assert operators.find_session() == (created[-1], sequences[-1])
+    report('find_session (marker)', count, *measure(operators.find_session))
+    # the session strip is gone, the markers say so without a scan
+    sequences[-1][sve.strip_source] = 'missing'
+    assert operators.find_session() == None
+    report('find_session (stale marker)', count, *measure(operators.find_session))
+    sequences[-1][sve.strip_source] = sequences[0].name
+    operators.mark_session()
+    assert operators.find_session() == None
+    report('find_session (no session)', count, *measure(operators.find_session))
+    # a file saved before the markers, none of the scenes has one
+    for scene in bpy.data.scenes: del scene[sve.session]
+    assert operators.find_session() == (created[-1], sequences[-1])
+    report('find_session (legacy scan)', count, *measure(operators.find_session))
+
+    for scene in created: bpy.data.scenes.remove(scene)
+
+def bench_cleanup(count: int, removed: int = 200):
+    # closing the editor removes the drivers of the effect strips, each strip has one per transform prop
+    import bpy
+    G = load_module('globals').G
+    scene = bpy.data.scenes.new('SVE_cleanup')
+    scene.sequence_editor_create()
+    scene.animation_data_create()
+    strips = [scene.sequence_editor.sequences.new_effect('strip_%05d' % jj, 'COLOR', 2, frame_start=1 + jj)
+              for jj in range(count)]
+    names = [strip.name for strip in strips[:removed]]
+    drivers = scene.animation_data.drivers
+
+    def drive():
+        for strip in strips:
+            for prop in ['offset_x', 'offset_y', 'scale_x', 'scale_y']: strip.transform.driver_add(prop)
+    def scan():
+        for name in names:
+            for fc in list(drivers):
+                if 'sequences_all["%s"]'%(name) in fc.data_path:
+                    drivers.remove(fc)
+    def index():
+        G.paths.clear()
+        G.paths.remove(scene, 'drivers', *names)
+
+    for label, cleanup in [('scan', scan), ('path index', index)]:
+        best = None
+        for _ in range(3):
+            drive()
+            tt = perf_counter()
+            cleanup()
+            tt = perf_counter() - tt
+            best = tt if best is None or tt < best else best
+            assert len(drivers) == 4 * (count - len(names))
+        print('  %-34s %6d  %10.3f ms' % ('driver cleanup, %s (x%d)' % (label, len(names)), count, best * 1000.0))
+    G.paths.clear()
+    bpy.data.scenes.remove(scene)
+
+def bench_bake(count: int):
+    # the baked curve evaluates like the curve with its noise modifiers, at every integer frame of a
+    # sampled span for step 1 and at every sample for a wider step
+    import bpy
+    utility = load_module('utility')
+    action = bpy.data.actions.new('SVE_bake')
+    def noisy(keys: list[float], ranges: list[tuple[float, float]]):
+        fcurve = action.fcurves.new('bake', len(action.fcurves))
+        for ii, frame in enumerate(keys):
+            fcurve.keyframe_points.insert(frame, float(ii % 7))
+        for start, end in ranges:
+            modifier = fcurve.modifiers.new('NOISE')
+            modifier.use_restricted_range = True
+            modifier.frame_start, modifier.frame_end = start, end
+        return fcurve
+    def check(keys: list[float], ranges: list[tuple[float, float]], step: int):
+        fcurve = noisy(keys, ranges)
+        frames = range(int(keys[0]), int(keys[-1]) + 1)
+        before = [fcurve.evaluate(frame) for frame in frames]
+        utility.bake_noise(fcurve, step)
+        assert len(fcurve.modifiers) == 0
+        after = [fcurve.evaluate(frame) for frame in frames]
+        sampled = [ii for ii, frame in enumerate(frames) if step == 1 or frame % step == 0]
+        assert max(abs(before[ii] - after[ii]) for ii in sampled) < 1e-5
+
+    for step in [1, 5]:
+        check([0.0, 10.0, 20.0, 30.0], [(5.0, 25.0)], step)
+        check([0.0, 10.0, 20.0, 30.0, 40.0], [(3.0, 12.0), (22.0, 35.0)], step)
+    keys = [float(ii * 10) for ii in range(count)]
+    ranges = [(keys[ii] + 2.0, keys[ii + 3] + 5.0) for ii in range(0, count - 4, 8)]
+    check(keys, ranges, 1)
+    report('bake_noise (step 1)', count, *measure(lambda: utility.bake_noise(noisy(keys, ranges), 1), repeat=1))
+    bpy.data.actions.remove(action)
+
+def pairwise_frames(keyframes) -> list[set[int]]:
+    frames = [set() for _ in keyframes]
+    for fr0 in range(len(keyframes) - 1):
+        kf0 = keyframes[fr0]
+        for fr1 in range(fr0 + 1, len(keyframes)):
+            kf1 = keyframes[fr1]
+            if kf1.start <= kf0.end:
+                frames[fr0].add( kf1.start )
+                if kf1.end <= kf0.end:
+                    frames[fr0].add( kf1.end )
+                else:
+                    frames[fr1].add( kf0.end )
+    return frames
+
+def bench_calc_bezier(count: int):
+    sve_math = load_module('sve_math')
+    rand = random.Random(count)
+    segments = []
+    for _ in range(count * 4):
+        start = rand.randint(0, 1000)
+        end = start + rand.randint(1, 60)
+        v0, v1 = rand.uniform(-100, 100), rand.uniform(-100, 100)
+        diff = min(end - start, 5.0)
+        segments.append(([start, v0], [start + diff, v0], [end - diff, v1], [end, v1], rand.uniform(start, end)))
+
+    columns = [[segment[ii] for segment in segments] for ii in range(5)]
+    report('calc_bezier (4 points/effect)', count,
+           *measure(lambda: [sve_math.calc_bezier(*segment) for segment in segments]))
+    report('calc_bezier_batch', count, *measure(lambda: sve_math.calc_bezier_batch(*columns)))
+
+def bench_engine(count: int):
+    effect_fcurve = load_module('effect_fcurve')
+    operators = load_module('operators')
+    effectC, fcurveC, rangeC = effect_fcurve.effectC, effect_fcurve.fcurveC, effect_fcurve.rangeC
+    sve = load_module('sve_struct').sve
+
+    tt = perf_counter()
+    current = session(count)
+    print('  %-34s %6d  %10.3f ms' % ('session setup', count, (perf_counter() - tt) * 1000.0))
+
+    fcurve = fcurveC.all[sve.offset_x]
+    def fresh_ranges():
+        effects, starts, ends, _ = fcurve.sorted_effects()
+        return fcurve.ranges_from(effects, starts, ends, reuse=False)
+    keyframes = fresh_ranges()
+    if count <= 1000:
+        # the range store leaves out a range's own start and end, they are keyed by the range itself
+        assert [kf.frames for kf in keyframes] == [
+            frames - {kf.start, kf.end} for kf, frames in zip(keyframes, pairwise_frames(keyframes))]
+
+    def frame_recalc_all():
+        for fc in fcurveC.all.values():
+            fc.keyframes = []
+            fc.frame_recalc()
+
+    effect = effectC.all['sve_effect_%05d' % (count // 2)]
+    def slide():
+        for delta in [3, -3]:
+            effect.effect.frame_start += delta
+            effect.frames_changed()
+
+    offset = effect_fcurve.G.orig_strip.frame_final_start
+    strings = [operators.stringify_effect(eff, offset) for eff in effectC.all.values()]
+    store = operators.dump_effects(effectC.all.values(), offset)
+    assert operators.parse_effects(store, offset) == [
+        (eff.name, operators.parse_effect(ss, offset)) for eff, ss in zip(effectC.all.values(), strings)]
+
+    sve_math = load_module('sve_math')
+    columns = [[], [], [], []]
+    for rr in fcurve.keyframes:
+        for column, value in zip(columns, (rr.start, rr.end, *rr.effect.get_values(rr.sve_path))):
+            column.append(value)
+    keys, sums = sve_math.bake_ranges(*columns)
+    assert keys.tolist() == fcurve.frame_keys
+    assert max(abs(value - fcurve.frame_values[key]) for key, value in zip(keys.tolist(), sums.tolist())) < 1e-6
+    # the handles stay 5 frames out, the shape rangeC.interpolate assumes
+    co = effect_fcurve.keyframes_get(fcurve.fcurve.keyframe_points).reshape(-1, 2)
+    right = effect_fcurve.keyframes_get(fcurve.fcurve.keyframe_points, 'handle_right').reshape(-1, 2)
+    assert (right[:, 0] - co[:, 0] == 5.0).all()
+
+    frames = list(range(1, count * 10, max(1, count // 10)))
+    effects = list(effectC.all.values())
+    def scan_at():
+        return [[eff for eff in effects if eff.start <= ff < eff.end] for ff in frames]
+    def index_at():
+        return [effectC.index.at(ff) for ff in frames]
+    assert [set(found) for found in index_at()] == [set(found) for found in scan_at()]
+    # frames changed behind the index, as an undo step does
+    for delta in [7, -7]:
+        effect.effect.frame_start += delta
+        effectC.reindex()
+        assert [set(found) for found in index_at()] == [set(found) for found in scan_at()]
+
+    report('ranges_from, fresh (offset_x)', count, *measure(fresh_ranges))
+    report('rangeC.__call__ (offset_x)', count, *measure(lambda: [rr() for rr in fcurve.keyframes]))
+    report('rangeC.call_all (offset_x)', count, *measure(lambda: rangeC.call_all(fcurve.keyframes)))
+    report('frame_recalc (all fcurves)', count, *measure(frame_recalc_all))
+    report('bake_ranges (offset_x)', count, *measure(lambda: sve_math.bake_ranges(*columns)))
+    report('effect_frame_recalc (slide one)', count, *measure(slide))
+    # a slide writes the patched keyframes, the value cached before it is not returned
+    scene = effect_fcurve.G.edit_scene
+    scene.frame_current = effect.start + 2
+    for delta in [8, -8]:
+        for fc in effect.fcurves: fc.evaluate
+        effect.effect.frame_start += delta
+        effect.frames_changed()
+        for fc in effect.fcurves:
+            assert fc.evaluate == fc.fcurve.evaluate(scene.frame_current)
+    scene.frame_current = 1
+
+    # slides patched in place match a full recalc, also across an undo step. the undo puts back the
+    # strip frames and keyframe points, then runs what the undo_redo handler does
+    utility = load_module('utility')
+    def curve_state():
+        return {fc.sve_path: effect_fcurve.keyframes_get(fc.fcurve.keyframe_points) for fc in fcurveC.all.values()}
+    def same_as_full() -> bool:
+        patched = curve_state()
+        frame_recalc_all()
+        full = curve_state()
+        return all(len(patched[path]) == len(full[path]) and sve_math.np.allclose(patched[path], full[path], atol=1e-3)
+                   for path in full)
+    others = [eff for eff in effects if eff is not effect and not eff.modifier][:3]
+    for other in others:
+        saved = {eff: eff.effect.frame_start for eff in effects}, curve_state()
+        effect.effect.frame_start += 5
+        effect.frames_changed()
+        for eff, frame_start in saved[0].items(): eff.effect.frame_start = frame_start
+        for fc in fcurveC.all.values(): utility.keyframes_from_co(fc.fcurve.keyframe_points, saved[1][fc.sve_path])
+        effectC.reindex()
+        fcurveC.forget_all()
+        fcurveC.recalc_all()
+        for delta in [4, -4]:
+            other.effect.frame_start += delta
+            other.frames_changed()
+            assert same_as_full()
+
+    # the neighbour and range queries follow the slides, compared by span as equal spans may tie
+    def span(eff): return None if eff is None else (eff.start, eff.end)
+    def sorted_spans(items): return [None] + sorted(span(eff) for eff in items) + [None]
+    for effect_ in [eff for eff in [effect] + others if not eff.modifier]:
+        expected = sorted_spans(effects)
+        ii = expected.index(span(effect_))
+        assert tuple(span(eff) for eff in effectC.index.neighbours(effect_)) == (expected[ii - 1], expected[ii + 1])
+        for fc in effect_.fcurves:
+            expected = sorted_spans(rr.effect for rr in fc.keyframes)
+            ii = expected.index(span(effect_))
+            assert tuple(span(eff) for eff in fc.neighbours(effect_)) == (expected[ii - 1], expected[ii + 1])
+            start, end = effect_.start - 5, effect_.end + 5
+            assert set(fc.effects_in(start, end)) == {eff for eff in fc.effects if eff.start <= end and eff.end >= start}
+    recalc_queue = effect_fcurve.recalc_queue
+    ticks = []
+    def sliced_recalc():
+        for fc in fcurveC.all.values(): fc.keyframes = []
+        fcurveC.recalc_all(sliced=True)
+        ticks.clear()
+        while True:
+            tt = perf_counter()
+            pending = recalc_queue.tick()
+            ticks.append(perf_counter() - tt)
+            if not pending: break
+    report('recalc_all, sliced (all fcurves)', count, *measure(sliced_recalc))
+    # measure's last call runs under tracemalloc, the ticks are taken from one more plain run
+    sliced_recalc()
+    print('  %-34s %d ticks, longest %.3f ms, budget %.1f ms' % (
+        'sliced ticks', len(ticks), max(ticks) * 1000.0, recalc_queue.budget * 1000.0))
+    report('effects at frame, scan (x%d)' % len(frames), count, *measure(scan_at))
+    report('effects at frame, intervalC (x%d)' % len(frames), count, *measure(index_at))
+    shakes = [eff for eff in effects if eff.modifier]
+    def shake_radius():
+        for radius in [12.0, 10.0]:
+            shakes[0].effect[sve.noise_radius] = radius
+            for fc in shakes[0].fcurves: fc.modifiers_value_recalc()
+    if shakes:
+        written, skipped = fcurveC.modifier_written, fcurveC.modifier_skipped
+        report('modifiers_value_recalc (one shake)', count, *measure(shake_radius))
+        print('  %-34s %d written, %d skipped' % ('modifier properties',
+            fcurveC.modifier_written - written, fcurveC.modifier_skipped - skipped))
+    def evaluate_frames(evaluate):
+        for frame in frames[:10]:
+            scene.frame_current = frame
+            for _ in range(10): evaluate()
+        scene.frame_current = 1
+    report('fcurve.evaluate (10 frames x10)', count, *measure(lambda: evaluate_frames(lambda: fcurve.fcurve.evaluate(scene.frame_current))))
+    report('fcurveC.evaluate (10 frames x10)', count, *measure(lambda: evaluate_frames(lambda: fcurve.evaluate)))
+    for frame in frames[:10]:
+        scene.frame_current = frame
+        assert fcurve.evaluate == fcurve.fcurve.evaluate(frame)
+    scene.frame_current = 1
+
+    report('stringify_effect', count,
+           *measure(lambda: [operators.stringify_effect(eff, offset) for eff in effectC.all.values()]))
+    report('parse_effect', count, *measure(lambda: [operators.parse_effect(ss, offset) for ss in strings]))
+    report('dump_effects', count, *measure(lambda: operators.dump_effects(effectC.all.values(), offset)))
+    report('parse_effects', count, *measure(lambda: operators.parse_effects(store, offset)))
+    print('  %-34s %s' % ('handle cache', effect_fcurve.G.handles.counters))
+
+    profiler = load_module('profiler').profiler
+    profiler.clear()
+    profiler.enabled = True
+    report('frame_recalc (profiled)', count, *measure(frame_recalc_all))
+    profiler.enabled = False
+    for row in profiler.rows():
+        print('    %-40s %6d calls  %10.3f ms  %8.3f max ms  %8.1f writes/call' % (
+            row['name'], row['calls'], row['total_ms'], row['max_ms'], row['writes_per_call']))
+
+    current.close()
+
+
+def main(args: list[str]):
+    global sizes
+    stand_in = bpy_stand_in()
+    if args: sizes = [int(arg) for arg in args]
+
+    print('sve benchmark, %s' % ('bpy stand-in' if stand_in else 'blender %s' % (
+        '.'.join(str(vv) for vv in sys.modules['bpy'].app.version))))
+    # inside blender sys.executable is the bundled python, the child imports against the stand-in too
+    imported = import_time()
+    print('  %-34s %6s  %10.3f ms  numpy %s, ctypes structs %s' % (
+        'import (bpy stand-in)', '', imported['time'] * 1000.0,
+        'loaded' if imported['numpy'] else 'deferred', 'built' if imported['structs'] else 'deferred'))
+    for count in sizes:
+        print('%d effects' % count)
+        bench_calc_bezier(count)
+        bench_engine(count)
+        bench_load(count)
+        bench_cleanup(count)
+        bench_bake(count)
+
+if __name__ == "__main__" and '--import' in sys.argv:
+    print(json.dumps(import_addon()))
+elif __name__ == "__main__":
+    main(sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:])
@@ -3,7 +3,6 @@
 import bpy
 from ctypes import *
 from .utility import printc
-import math
 # Handler type enum. Operator is 3
 WM_HANDLER_TYPE_GIZMO = 1
 WM_HANDLER_TYPE_UI = 2
@@ -436,7 +435,9 @@ def init_structs():
 def get_running_op(window) -> str | None: pass
 
 
+# the struct fields are only built for blender 3.x, on the first poll
 def get_running_op_3_x_x(window) -> str | None:
+    if StructBase._structs: init_structs()
     win = wmWindow(window)
     for handle in win.modalhandlers:
         if handle.type == WM_HANDLER_TYPE_OP:
@@ -456,185 +457,10 @@ if bpy.app.version < (4, 0, 0):
 else:
     get_running_op = get_running_op_4_x_x
 
-def calc_bezier(v1, v2, v3, v4, point) -> float:
-    def sqrt3d(dd: float) -> float:
-        if dd == 0.0: return 0.0
-        return math.copysign(1.0 ,dd) * math.exp(math.log(abs(dd)) / 3.0)
-
-    def solve_cubic(c0: float, c1: float, c2: float, c3: float) -> tuple[int, list[float]]:
-        o: list[float] = [0.0] * 5
-        
-        nr: int = 0
-        floatsmall: float = -1.0e-10
-        floatone: float = 1.000001
-
-        if (c3 != 0.0):
-            a = c2 / c3
-            b = c1 / c3
-            c = c0 / c3
-            a = a / 3
-
-            p = b / 3 - a * a
-            q = (2 * a * a * a - a * b + c) / 2
-            d = q * q + p * p * p
-
-            if (d > 0.0):
-                t = math.sqrt(d)
-                o[0] = float(sqrt3d(-q + t) + sqrt3d(-q - t) - a)
-
-                if ((o[0] >= floatsmall) and (o[0] <= floatone)):
-                    return 1, o
-                return 0, o
-            
-            if (d == 0.0):
-                t = sqrt3d(-q)
-                o[0] = float(2 * t - a)
-
-                if ((o[0] >= floatsmall) and (o[0] <= floatone)):
-                    nr += 1
-                
-                o[nr] = float(-t - a)
-
-                if ((o[nr] >= floatsmall) and (o[nr] <= floatone)):
-                    return nr + 1, o
-                return nr, o
-
-            phi = math.acos(-q / math.sqrt(-(p * p * p)))
-            t = math.sqrt(-p)
-            p = math.cos(phi / 3)
-            q = math.sqrt(3 - 3 * p * p)
-            o[0] = float(2 * t * p - a)
-
-            if ((o[0] >= floatsmall) and (o[0] <= floatone)):
-                nr += 1
-            o[nr] = float(-t * (p + q) - a)
-
-            if ((o[nr] >= floatsmall) and (o[nr] <= floatone)):
-                nr += 1
-            o[nr] = float(-t * (p - q) - a)
-
-            if ((o[nr] >= floatsmall) and (o[nr] <= floatone)):
-                return nr + 1, o
-            return nr, o
-        a = c2
-        b = c1
-        c = c0
-
-        if (a != 0.0):
-            # /* Discriminant */
-            p = b * b - 4 * a * c;
-
-            if (p > 0):
-                p = math.sqrt(p);
-                o[0] = float((-b - p) / (2 * a));
-
-                if ((o[0] >= floatsmall) and (o[0] <= floatone)):
-                    nr += 1
-                o[nr] = float((-b + p) / (2 * a));
-
-                if ((o[nr] >= floatsmall) and (o[nr] <= floatone)):
-                    return nr + 1, o
-                return nr, o
-
-            if (p == 0):
-                o[0] = float(-b / (2 * a));
-                if ((o[0] >= floatsmall) and (o[0] <= floatone)):
-                    return 1, o
-            return 0, o
-
-        if (b != 0.0):
-            o[0] = float(-c / b);
-
-            if ((o[0] >= floatsmall) and (o[0] <= floatone)):
-                return 1, o
-            return 0, o
-
-        if (c == 0.0):
-            o[0] = 0.0
-            return 1, o
-        return 0, o
-
-    def berekeny(f1: float, f2: float, f3: float, f4: float, o: list[float]):
-        c0 = f1
-        c1 = 3.0 * (f2 - f1)
-        c2 = 3.0 * (f1 - 2.0 * f2 + f3)
-        c3 = f4 - f1 + 3.0 * (f2 - f3)
-        return c0 + o[0] * c1 + o[0] * o[0] * c2 + o[0] * o[0] * o[0] * c3
-    
-    def findzero(x, q0, q1, q2, q3):
-        c0 = q0 - x
-        c1 = 3.0 * (q1 - q0)
-        c2 = 3.0 * (q0 - 2.0 * q1 + q2)
-        c3 = q3 - q0 + 3.0 * (q1 - q2)
-
-        return solve_cubic(c0, c1, c2, c3)
-
-    def BKE_fcurve_correct_bezpart( v1: list[float,float],  v2: list[float,float],  v3: list[float,float],  v4: list[float,float]):
-        h1 = [0.0, 0.0]
-        h2 = [0.0, 0.0]
-
-        len1, len2, len0, fac
-
-        # /* Calculate handle deltas. */
-        h1[0] = v1[0] - v2[0]
-        h1[1] = v1[1] - v2[1]
-
-        h2[0] = v4[0] - v3[0]
-        h2[1] = v4[1] - v3[1]
-
-        # /* Calculate distances:
-        # * - len  = Span of time between keyframes.
-        # * - len1 = Length of handle of start key.
-        # * - len2 = Length of handle of end key.
-        # */
-        len0 = v4[0] - v1[0]
-        len1 = abs(h1[0])
-        len2 = abs(h2[0])
-
-        # /* If the handles have no length, no need to do any corrections. */
-        if ((len1 + len2) == 0.0):
-            return v1, v2, v3 , v4
-
-        # /* To prevent looping or rewinding, handles cannot
-        # * exceed the adjacent key-frames time position. */
-        if (len1 > len0):
-            fac = len0 / len1
-            v2[0] = (v1[0] - fac * h1[0])
-            v2[1] = (v1[1] - fac * h1[1])
-
-        if (len2 > len0):
-            fac = len0 / len2
-            v3[0] = (v4[0] - fac * h2[0])
-            v3[1] = (v4[1] - fac * h2[1])
-        return v1, v2, v3 , v4
-    
-    # # /* Bezier interpolation. */
-    # # /* (v1, v2) are the first keyframe and its 2nd handle. */
-    # v1[0] = prevbezt->vec[1][0];
-    # v1[1] = prevbezt->vec[1][1];
-    # v2[0] = prevbezt->vec[2][0];
-    # v2[1] = prevbezt->vec[2][1];
-    # # /* (v3, v4) are the last keyframe's 1st handle + the last keyframe. */
-    # v3[0] = bezt->vec[0][0];
-    # v3[1] = bezt->vec[0][1];
-    # v4[0] = bezt->vec[1][0];
-    # v4[1] = bezt->vec[1][1];
-    # # /* Adjust handles so that they don't overlap (forming a loop). */
-
-    # v1, v2, v3 , v4 = BKE_fcurve_correct_bezpart(v1, v2, v3, v4)
-
-    # /* Try to get a value for this position - if failure, try another set of points. */
-    zero, opl = findzero(point, v1[0], v2[0], v3[0], v4[0])
-    if zero == 0: 
-        return 0.0
-    else:
-        return berekeny(v1[1], v2[1], v3[1], v4[1], opl)
-
-init_structs()
-
 if __name__ == "__main__":
     
     # Important. This sets up the struct fields.
+    init_structs()
 
     win = wmWindow(bpy.context.window)
 
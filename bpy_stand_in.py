@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+
+# Lightweight stand-in for the parts of bpy the effect/fcurve engine touches, so
+# benchmark.py can run under plain CPython. Not loaded by blender as part of the addon.
+
+import math
+import sys
+import types
+
+
+class id_properties:
+    def __getitem__(self, key): return self._props[key]
+    def __setitem__(self, key, value): self._props[key] = value
+    def __delitem__(self, key): del self._props[key]
+    def __contains__(self, key): return key in self._props
+    def keys(self): return self._props.keys()
+    def get(self, key, default=None): return self._props.get(key, default)
+    def id_properties_ensure(self): return id_property_group(self._props)
+    def id_properties_ui(self, prop): return id_property_ui()
+
+class id_property_group:
+    def __init__(self, props: dict) -> None: self._props = props
+    def to_dict(self) -> dict: return dict(self._props)
+
+class id_property_ui:
+    def update(self, **kwargs): pass
+
+
+class bpy_struct:
+    _path: str = ''
+    _scene: 'Scene' = None
+    def as_pointer(self) -> int: return id(self)
+    @property
+    def id_data(self): return self._scene
+
+    def path_from_id(self, prop: str = None) -> str:
+        if prop is None: return self._path
+        return self._path + (prop if prop[:1] == '[' else '.' + prop)
+
+    def path_resolve(self, prop: str, coerce: bool = True):
+        return (self, prop) if not coerce else getattr(self, prop)
+
+    def driver_add(self, prop: str, index: int = -1):
+        value = getattr(self, prop, None)
+        drivers = self._scene.animation_data.drivers
+        if isinstance(value, list):
+            return [drivers.new(self.path_from_id(prop), ii) for ii in range(len(value))]
+        return drivers.new(self.path_from_id(prop))
+
+    def driver_remove(self, prop: str, index: int = -1) -> bool:
+        return self._scene.animation_data.drivers.remove_path(self.path_from_id(prop))
+
+
+class Transform(bpy_struct):
+    def __init__(self, path: str, scene) -> None:
+        self._path, self._scene = path, scene
+        self.offset_x = 0.0
+        self.offset_y = 0.0
+        self.rotation = 0.0
+        self.scale_x = 1.0
+        self.scale_y = 1.0
+        self.origin = [0.5, 0.5]
+        self.filter = 'AUTO'
+
+class Crop(bpy_struct):
+    def __init__(self, path: str, scene) -> None:
+        self._path, self._scene = path, scene
+        self.min_x = self.min_y = self.max_x = self.max_y = 0
+
+class Strip(id_properties, bpy_struct):
+    def __init__(self, scene, name: str, type: str, channel: int, frame_start: int, frame_end: int) -> None:
+        self._props = {}
+        self._scene = scene
+        self._path = 'sequence_editor.sequences_all["%s"]' % name
+        self.name = name
+        self.type = type
+        self.channel = channel
+        self._frame_start = frame_start
+        self.frame_final_start = frame_start
+        self.frame_final_end = frame_end
+        self.select = False
+        self.lock = False
+        self.blend_alpha = 1.0
+        self.blend_type = 'ALPHA_OVER'
+        self.use_flip_x = self.use_flip_y = False
+        self.transform = Transform(self._path + '.transform', scene)
+        self.crop = Crop(self._path + '.crop', scene)
+        self.elements = []
+
+    # moving the strip moves its final range with it
+    @property
+    def frame_start(self) -> int:
+        return self._frame_start
+    @frame_start.setter
+    def frame_start(self, frame: int):
+        delta = frame - self._frame_start
+        self._frame_start = frame
+        self.frame_final_start += delta
+        self.frame_final_end += delta
+
+    @property
+    def frame_final_duration(self) -> int:
+        return self.frame_final_end - self.frame_final_start
+    @frame_final_duration.setter
+    def frame_final_duration(self, duration: int):
+        self.frame_final_end = self.frame_final_start + duration
+
+
+class name_collection:
+    def __init__(self) -> None: self._items = {}
+    def __iter__(self): return iter(list(self._items.values()))
+    def __len__(self): return len(self._items)
+    def __contains__(self, name): return name in self._items
+    def __getitem__(self, key):
+        if isinstance(key, int): return list(self._items.values())[key]
+        return self._items[key]
+    def get(self, name, default=None): return self._items.get(name, default)
+    def unique(self, name: str) -> str:
+        if name not in self._items: return name
+        index = 1
+        while '%s.%03d' % (name, index) in self._items: index += 1
+        return '%s.%03d' % (name, index)
+
+class Sequences(name_collection):
+    def __init__(self, scene) -> None:
+        super().__init__()
+        self._scene = scene
+    def _add(self, name, type, channel, frame_start, frame_end) -> Strip:
+        name = self.unique(name)
+        strip = self._items[name] = Strip(self._scene, name, type, channel, frame_start, frame_end)
+        return strip
+    def new_image(self, name, filepath, channel, frame_start, fit_method='ORIGINAL_SIZE') -> Strip:
+        return self._add(name, 'IMAGE', channel, frame_start, frame_start + 1)
+    def new_effect(self, name, type, channel, frame_start, frame_end=0, **kwargs) -> Strip:
+        return self._add(name, type, channel, frame_start, max(frame_end, frame_start + 1))
+    def remove(self, strip: Strip):
+        del self._items[strip.name]
+
+class SequenceEditor(bpy_struct):
+    def __init__(self, scene) -> None:
+        self._scene = scene
+        self._path = 'sequence_editor'
+        self.sequences = Sequences(scene)
+        self.sequences_all = self.sequences
+        self.active_strip = None
+        self.channels = {'Channel %d' % ii: types.SimpleNamespace(lock=False) for ii in range(1, 129)}
+
+
+class Keyframe:
+    def __init__(self, frame: float = 0.0, value: float = 0.0) -> None:
+        self.co = [frame, value]
+        self.handle_left = [frame, value]
+        self.handle_right = [frame, value]
+        self.interpolation = 'BEZIER'
+        self.handle_left_type = self.handle_right_type = 'AUTO_CLAMPED'
+
+class KeyframePoints:
+    def __init__(self) -> None: self._points = []
+    def __len__(self): return len(self._points)
+    def __iter__(self): return iter(self._points)
+    def __getitem__(self, index): return self._points[index]
+    def add(self, count: int = 1):
+        self._points.extend(Keyframe() for _ in range(count))
+    def remove(self, point: Keyframe, fast: bool = False):
+        for ii, pp in enumerate(self._points):
+            if pp is point:
+                del self._points[ii]
+                return
+    def clear(self): self._points.clear()
+    def sort(self): self._points.sort(key=lambda pp: pp.co[0])
+    def insert(self, frame: float, value: float, options=set(), keyframe_type='KEYFRAME') -> Keyframe:
+        for pp in self._points:
+            if pp.co[0] == frame:
+                pp.co[1] = value
+                return pp
+        point = Keyframe(frame, value)
+        self._points.append(point)
+        self.sort()
+        return point
+    def foreach_get(self, attr: str, seq):
+        index = 0
+        for pp in self._points:
+            vv = getattr(pp, attr)
+            seq[index], seq[index + 1] = vv[0], vv[1]
+            index += 2
+    def foreach_set(self, attr: str, seq):
+        for ii, pp in enumerate(self._points):
+            setattr(pp, attr, [float(seq[ii * 2]), float(seq[ii * 2 + 1])])
+
+class FModifier:
+    def __init__(self, type: str) -> None:
+        self.type = type
+        self.frame_start = 0.0
+        self.frame_end = 0.0
+        self.blend_in = 0.0
+        self.blend_out = 0.0
+        self.influence = 1.0
+        self.mute = False
+        self.use_influence = False
+        self.use_restricted_range = False
+        if type == 'NOISE':
+            self.blend_type = 'REPLACE'
+            self.depth = 0
+            self.offset = 0.0
+            self.phase = 1.0
+            self.scale = 1.0
+            self.strength = 1.0
+
+class FModifiers:
+    def __init__(self) -> None: self._items = []
+    def __len__(self): return len(self._items)
+    def __iter__(self): return iter(list(self._items))
+    def new(self, type: str) -> FModifier:
+        self._items.append(FModifier(type))
+        return self._items[-1]
+    def remove(self, modifier: FModifier): self._items.remove(modifier)
+
+class DriverTarget:
+    data_path = ''
+    id_type = 'OBJECT'
+    id = None
+
+class DriverVariables(list):
+    def new(self):
+        self.append(types.SimpleNamespace(type='SINGLE_PROP', targets=[DriverTarget()]))
+        return self[-1]
+
+class FCurve:
+    def __init__(self, data_path: str, index: int = 0) -> None:
+        self.data_path = data_path
+        self.array_index = index
+        self.keyframe_points = KeyframePoints()
+        self.modifiers = FModifiers()
+        self.driver = types.SimpleNamespace(type='SCRIPTED', expression='', is_valid=True, variables=DriverVariables())
+    # like blender, update recalculates the auto handles, a third of the way to the neighbour keys
+    def update(self):
+        points = self.keyframe_points
+        points.sort()
+        for ii, pp in enumerate(points._points):
+            if pp.handle_left_type in ('AUTO', 'AUTO_CLAMPED') and ii > 0:
+                pp.handle_left = [pp.co[0] - (pp.co[0] - points[ii - 1].co[0]) / 3.0, pp.co[1]]
+            if pp.handle_right_type in ('AUTO', 'AUTO_CLAMPED') and ii + 1 < len(points):
+                pp.handle_right = [pp.co[0] + (points[ii + 1].co[0] - pp.co[0]) / 3.0, pp.co[1]]
+    def evaluate(self, frame: float) -> float:
+        value = self.evaluate_keys(frame)
+        # a deterministic stand-in for blender's noise, REPLACE blending inside the restricted range
+        for modifier in self.modifiers:
+            if modifier.type != 'NOISE' or modifier.mute: continue
+            if modifier.use_restricted_range and not modifier.frame_start <= frame <= modifier.frame_end: continue
+            noise = math.sin(frame / modifier.scale * 12.9898 + modifier.phase + modifier.offset) * 0.5
+            value += noise * modifier.strength
+        return value
+    def evaluate_keys(self, frame: float) -> float:
+        points = self.keyframe_points._points
+        if len(points) == 0: return 0.0
+        for p0, p1 in zip(points, points[1:]):
+            if p0.co[0] <= frame <= p1.co[0]:
+                fac = (frame - p0.co[0]) / ((p1.co[0] - p0.co[0]) or 1.0)
+                return p0.co[1] + (p1.co[1] - p0.co[1]) * fac
+        return points[0].co[1] if frame < points[0].co[0] else points[-1].co[1]
+
+class FCurves:
+    def __init__(self) -> None: self._items = {}
+    def __len__(self): return len(self._items)
+    def __iter__(self): return iter(list(self._items.values()))
+    def new(self, data_path: str, index: int = 0, action_group: str = '') -> FCurve:
+        fcurve = self._items[(data_path, index)] = FCurve(data_path, index)
+        return fcurve
+    def find(self, data_path: str, index: int = 0) -> FCurve:
+        return self._items.get((data_path, index))
+    def remove(self, fcurve: FCurve):
+        del self._items[(fcurve.data_path, fcurve.array_index)]
+    def remove_path(self, data_path: str) -> bool:
+        keys = [key for key in self._items if key[0] == data_path]
+        for key in keys: del self._items[key]
+        return len(keys) > 0
+
+class Action(bpy_struct):
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.fcurves = FCurves()
+
+class AnimData:
+    def __init__(self) -> None:
+        self.action = None
+        self.drivers = FCurves()
+
+class Scene(id_properties, bpy_struct):
+    def __init__(self, name: str) -> None:
+        self._props = {}
+        self._scene = self
+        self.name = name
+        self.frame_current = 1
+        self.frame_start = 1
+        self.frame_end = 250
+        self.sequence_editor = None
+        self.animation_data = None
+        self.render = types.SimpleNamespace(resolution_x=64, resolution_y=36)
+    def sequence_editor_create(self) -> SequenceEditor:
+        if self.sequence_editor is None: self.sequence_editor = SequenceEditor(self)
+        return self.sequence_editor
+    def animation_data_create(self) -> AnimData:
+        if self.animation_data is None: self.animation_data = AnimData()
+        return self.animation_data
+
+class WindowManager(id_properties):
+    def __init__(self) -> None:
+        self._props = {}
+        self.windows = []
+
+class data_collection(name_collection):
+    def __init__(self, factory) -> None:
+        super().__init__()
+        self._factory = factory
+    def new(self, name: str, *args, **kwargs):
+        name = self.unique(name)
+        item = self._items[name] = self._factory(name)
+        return item
+    def remove(self, item, **kwargs):
+        del self._items[item.name]
+
+
+class timers:
+    def __init__(self) -> None: self.registered = {}
+    def register(self, function, first_interval: float = 0.0, persistent: bool = False):
+        self.registered[function] = first_interval
+    def unregister(self, function): self.registered.pop(function, None)
+    def is_registered(self, function) -> bool: return function in self.registered
+
+class msgbus:
+    @staticmethod
+    def subscribe_rna(key=None, owner=None, args=(), notify=None, options=set()): pass
+    @staticmethod
+    def clear_by_owner(owner): pass
+    @staticmethod
+    def publish_rna(key=None): pass
+
+class _type_base:
+    bl_idname = ''
+    bl_label = ''
+    def __init_subclass__(cls, **kwargs): pass
+
+def _property(*args, **kwargs): return None
+
+class gpu_vertformat:
+    def __init__(self) -> None: self.lengths = {}
+    def attr_add(self, id: str, comp_type: str, len: int, fetch_mode: str): self.lengths[id] = len
+
+class gpu_shader:
+    def uniform_float(self, name: str, value): pass
+    # like the UNIFORM_COLOR builtin since 3.4, pos is a vec3
+    def format_calc(self):
+        format = gpu_vertformat()
+        format.attr_add(id='pos', comp_type='F32', len=3, fetch_mode='FLOAT')
+        return format
+
+# like blender's python buffers the usage is static, the data is freed once the buffer is drawn
+class gpu_vertbuf:
+    def __init__(self, format, len: int) -> None:
+        self.format = format
+        self.attrs = {}
+        self.len = len
+        self.uploaded = False
+    def attr_fill(self, id: str, data):
+        if self.uploaded: raise ValueError("Can't fill, static buffer already in use")
+        data = list(data)
+        if self.format != None and any(len(item) != self.format.lengths[id] for item in data):
+            raise ValueError('Expected a sequence of size %d' % self.format.lengths[id])
+        self.attrs[id] = data
+
+class gpu_batch:
+    def __init__(self, type: str, buf: gpu_vertbuf) -> None:
+        self.type = type
+        self.buf = buf
+    def draw(self, shader=None): self.buf.uploaded = True
+
+def install_gpu():
+    # the draw callbacks only run inside blender, __init__ needs the modules to import
+    gpu = types.ModuleType('gpu')
+    gpu.shader = types.SimpleNamespace(from_builtin=lambda name: gpu_shader())
+    gpu.state = types.SimpleNamespace(blend_set=lambda mode: None, line_width_set=lambda width: None)
+    gpu.types = types.SimpleNamespace(GPUVertFormat=gpu_vertformat, GPUVertBuf=gpu_vertbuf, GPUBatch=gpu_batch)
+    gpu_extras = types.ModuleType('gpu_extras')
+    gpu_extras.__path__ = []
+    batch = types.ModuleType('gpu_extras.batch')
+    batch.batch_for_shader = lambda shader, type, content: gpu_batch(type, gpu_vertbuf(None, 0))
+    gpu_extras.batch = batch
+    sys.modules.update({'gpu': gpu, 'gpu_extras': gpu_extras, 'gpu_extras.batch': batch})
+
+def install() -> types.ModuleType:
+    bpy = types.ModuleType('bpy')
+    bpy.__stand_in__ = True
+    bpy.app = types.SimpleNamespace(
+        version=(4, 2, 0), timers=timers(), driver_namespace={},
+        handlers=types.SimpleNamespace(
+            persistent=lambda function: function,
+            load_post=[], depsgraph_update_post=[], frame_change_post=[], undo_post=[], redo_post=[]))
+    bpy.types = types.SimpleNamespace(
+        bpy_struct=bpy_struct, Operator=_type_base, Panel=_type_base, Menu=_type_base,
+        UIList=_type_base, PropertyGroup=_type_base,
+        SpaceSequenceEditor=types.SimpleNamespace(draw_handler_add=lambda *args: None),
+        SequenceEditor=SequenceEditor, Sequence=Strip, Scene=Scene)
+    bpy.props = types.SimpleNamespace(
+        IntProperty=_property, FloatProperty=_property, StringProperty=_property,
+        BoolProperty=_property, EnumProperty=_property, PointerProperty=_property)
+    bpy.utils = types.SimpleNamespace(register_class=lambda cl: None, unregister_class=lambda cl: None)
+    bpy.msgbus = msgbus
+    bpy.data = types.SimpleNamespace(
+        scenes=data_collection(Scene), actions=data_collection(Action),
+        images=data_collection(lambda name: types.SimpleNamespace(name=name)))
+    bpy.context = types.SimpleNamespace(
+        scene=None, window=None, region=None, area=None, active_sequence_strip=None,
+        screen=types.SimpleNamespace(areas=[]),
+        window_manager=WindowManager())
+    bpy.ops = types.SimpleNamespace()
+    sys.modules['bpy'] = bpy
+    install_gpu()
+    return bpy
@@ -1,13 +1,86 @@
 #!/usr/bin/env python3
 import bpy
+from math import inf
+from bisect import bisect_left, bisect_right, insort
 from typing import Callable
-from .sve_struct import sve, anim_base
-from .utility import get_from_path, printc
+from operator import attrgetter
+from zlib import crc32
+from time import perf_counter
+from .sve_struct import sve, anim_base, modifier_default
+from .utility import get_from_path, printc, keyframes_get, keyframes_set
 from .globals import G
-from .bpy_ctypes import calc_bezier
-    
+from .sve_math import np, calc_bezier, interpolate_batch, overlap_points
+from .scheduler import scheduler
+from .profiler import profiler
+
+# items sorted by (start, end) for the items at a frame, in a range and next to an item.
+# a query bisects the starts, no item starts before start - max_length (as fcurveC.overlapping).
+# the span an item was indexed with is kept, move() re-sorts it after its frames changed
+class intervalC:
+    entries: list[tuple[int, int, int, object]]
+    spans: dict[object, tuple[int, int, int]]
+    max_length: int
+    order: int
+
+    def __init__(self) -> None:
+        self.entries = []
+        self.spans = {}
+        self.max_length = 0
+        self.order = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+    def __contains__(self, item) -> bool:
+        return item in self.spans
+
+    def add(self, item):
+        if item in self.spans: return self.move(item)
+        start, end = item.start, item.end
+        self.order += 1
+        self.spans[item] = (start, end, self.order)
+        insort(self.entries, (start, end, self.order, item))
+        self.max_length = max(self.max_length, end - start)
+
+    def remove(self, item):
+        span = self.spans.pop(item, None)
+        if span == None: return
+        del self.entries[bisect_left(self.entries, span)]
+        if len(self.entries) == 0: self.max_length = 0
+
+    def move(self, item) -> bool:
+        span = self.spans.get(item)
+        if span != None and span[:2] == (item.start, item.end): return False
+        self.remove(item)
+        self.add(item)
+        return True
+
+    def clear(self):
+        self.entries.clear()
+        self.spans.clear()
+        self.max_length = 0
+
+    # items intersecting [start, end]
+    def in_range(self, start: int, end: int) -> list:
+        entries = self.entries
+        lo = bisect_left(entries, (start - self.max_length,))
+        hi = bisect_right(entries, (end, inf))
+        return [entry[3] for entry in entries[lo:hi] if entry[1] >= start]
+
+    # items shown at frame, the end frame of a strip is exclusive
+    def at(self, frame: int) -> list:
+        entries = self.entries
+        lo = bisect_left(entries, (frame - self.max_length,))
+        hi = bisect_right(entries, (frame, inf))
+        return [entry[3] for entry in entries[lo:hi] if entry[1] > frame]
+
+    def neighbours(self, item) -> tuple[object, object]:
+        index = bisect_left(self.entries, self.spans[item])
+        return (self.entries[index - 1][3] if index > 0 else None,
+                self.entries[index + 1][3] if index + 1 < len(self.entries) else None)
+
 class effectC:
     all: dict[str, 'effectC'] = {}
+    index: intervalC = intervalC()
     _effect_name: str
     fcurves: set['fcurveC']
     atype: anim_base
@@ -48,12 +121,13 @@ class effectC:
             init3(self, *args)
         
         self.fcurves = set()
+        replaced = self.all.get(self.effect.name)
+        if replaced != None: self.index.remove(replaced)
         self.all[self.effect.name] = self
+        self.index.add(self)
         G.strips.add(self.effect.name)
 
-        for fc in list(G.edit_scene.animation_data.drivers):
-            if 'sequences_all["%s"]'%(self.effect.name) in fc.data_path:
-                G.edit_scene.animation_data.drivers.remove(fc)
+        G.paths.remove(G.edit_scene, 'drivers', self.effect.name)
 
         for prop, call in self.prop_update.items():
             call(self, self.effect[prop])
@@ -66,8 +140,25 @@ class effectC:
             if sve.props[prop].use:
                 for use in sve.props[prop].use:
                     self.subscribe_prop(use)
+        self.subscribe_frames()
 
 
+    @staticmethod
+    def clear():
+        effectC.all.clear()
+        effectC.index.clear()
+
+    # undo/redo brings back older frames, the effects whose strip is gone are left to the strip ledger
+    @staticmethod
+    def reindex():
+        effectC.index.clear()
+        for effect in effectC.all.values():
+            if effect.effect != None: effectC.index.add(effect)
+
+    def frames_changed(self):
+        effectC.index.move(self)
+        for fc in self.fcurves: fc.effect_frame_recalc(self)
+
     def add_to_fcurve(self, svepath: str):
         if svepath not in fcurveC.all:
             fcurve = fcurveC(svepath)
@@ -76,7 +167,7 @@ class effectC:
 
         fcurve.add_effect(self)
         self.fcurves.add(fcurve)
-        fcurve.frame_recalc()
+        fcurve.recalc_request('frame')
 
     def remove_from_fcurve(self, svepath: str):
         if svepath not in fcurveC.all: return
@@ -84,7 +175,7 @@ class effectC:
         fcurve.remove_effect(self)
         if fcurve in self.fcurves:
             self.fcurves.remove(fcurve)
-        fcurve.frame_recalc()
+        fcurve.recalc_request('frame')
 
     def get_values(self, sve_path) -> tuple[float,float]:
         # if self.effect == None: return 0, 0
@@ -103,17 +194,29 @@ class effectC:
     def subscribe_prop(self, prop):
         def notify(*args, **kwargs):
             if prop in fcurveC.all:
-                fcurveC.all[prop].keyframes_value_recalc()
+                fcurveC.all[prop].recalc_request('keyframes')
         
         bpy.msgbus.subscribe_rna(
             key=get_from_path(self.effect, sve.props[prop].path, lambda base, targ: base.path_resolve(targ, False) ),
             owner=self.effect, args=(1,), options={'PERSISTENT',},
             notify=notify )
-        
+
+    # start/end edited in the sidebar or by python, the transform operators are caught by check_running_op
+    def subscribe_frames(self):
+        def notify(*args, **kwargs):
+            if self.effect != None and effectC.all.get(self.effect.name) is self:
+                self.frames_changed()
+
+        for prop in ['frame_start', 'frame_final_start', 'frame_final_end', 'frame_final_duration',
+                     'frame_offset_start', 'frame_offset_end']:
+            bpy.msgbus.subscribe_rna(
+                key=self.effect.path_resolve(prop, False),
+                owner=self.effect, args=(1,), options={'PERSISTENT',},
+                notify=notify )
+
     @property
     def effect(self) -> object:
-        if self._effect_name and G.edit_scene and self._effect_name in G.edit_scene.sequence_editor.sequences:
-            return G.edit_scene.sequence_editor.sequences[self._effect_name]
+        if self._effect_name: return G.strip(self._effect_name)
         return None
 
     @effect.setter
@@ -150,40 +253,167 @@ class effectC:
     @property
     def blend_alpha(self):
         return self.effect.blend_alpha
+
+# stored effect without a sequencer strip, contributes to the fcurves like an effectC
+# and is materialized into one once it is inside the timeline view
+class effect_record:
+    all: dict[str, 'effect_record'] = {}
+    index: intervalC = intervalC()
+    view: tuple[float, float] = None
+    name: str
+    atype: anim_base
+    start: int
+    end: int
+    values: dict[str, list]
+    fcurves: set['fcurveC']
+    startend = 0
+
+    # a detached record only reads values, it is not in all and adds nothing to the fcurves
+    def __init__(self, name: str, props: dict, attach: bool = True) -> None:
+        self.name = name
+        self.type = props['type']
+        self.atype = anim_base.all[self.type]
+        self.start = props['start']
+        self.end = max(props['end'], self.start + 1)
+        self.values = {prop: list(value) for prop, value in props.get('props', {}).items()}
+        self.fcurves = set()
+        if not attach: return
+        self.all[name] = self
+        self.index.add(self)
+
+        for path in self.uses():
+            self.add_to_fcurve(path)
+
+    def uses(self) -> list[str]:
+        return [path for prop in self.atype.props if sve.props[prop].use and self[prop]
+                for path in sve.props[prop].use]
+
+    add_to_fcurve = effectC.add_to_fcurve
+    remove_from_fcurve = effectC.remove_from_fcurve
+
+    @staticmethod
+    def clear():
+        effect_record.all.clear()
+        effect_record.index.clear()
+
+    # the record stands in for its own strip's id properties
+    def __contains__(self, prop: str) -> bool:
+        return prop in self.values or prop in self.atype.defaults
+    def __getitem__(self, prop: str):
+        if prop in self.values: return self.values[prop][-1]
+        return self.atype.defaults[prop]
+
+    def get_values(self, sve_path) -> tuple[float,float]:
+        if sve_path not in self.values:
+            default = self.atype.default(sve_path)
+            self.values[sve_path] = [default, default]
+        return self.values[sve_path][0], self.values[sve_path][1]
+
+    def set_values(self, sve_path, val0, val1):
+        self.values[sve_path] = [val0, val1]
+        scheduler.mark('lazy')
+        return val0, val1
+
+    def materialize(self) -> effectC:
+        for fcurve in list(self.fcurves):
+            self.remove_from_fcurve(fcurve.sve_path)
+        del self.all[self.name]
+        self.index.remove(self)
+        return effectC(self.name, G.edit_scene, {
+            'type': self.type, 'start': self.start, 'end': self.end, 'props': self.values})
+
+    @property
+    def effect(self) -> 'effect_record':
+        return self
+    @property
+    def modifier(self) -> dict:
+        return self.atype.modifier(self)
+    @property
+    def frame(self) -> int:
+        return self.start
+
+    @staticmethod
+    def in_view(start: float, end: float) -> list['effect_record']:
+        return effect_record.index.in_range(start, end)
+
+    # records have no strip to select, selecting the edit strip selects the records under the playhead
+    @staticmethod
+    def selected() -> list['effect_record']:
+        if G.edit_strip == None or not G.edit_strip.select: return []
+        return effect_record.index.at(G.edit_scene.frame_current)
+
+    @staticmethod
+    @profiler.timed
+    def materialize_view() -> bool:
+        records = effect_record.selected()
+        if effect_record.view != None:
+            records += [record for record in effect_record.in_view(*effect_record.view) if record not in records]
+        if len(records) == 0: return False
+        sequence_editor = G.edit_scene.sequence_editor
+        active = sequence_editor.active_strip
+        for record in records:
+            record.materialize()
+        sequence_editor.active_strip = active
+        fcurveC.recalc_all(sliced=True)
+        scheduler.mark('lazy')
+        return False
     
 class comparerC:
+    __slots__ = ('start', 'end', 'effect')
     start: int
     end: int
     effect: effectC
-    effectID: int
-    def __init__(self, effect: effectC) -> None:
-        self.start = effect.start
-        self.end = effect.end
+    sort_key = attrgetter('start', 'end')
+
+    def __init__(self, effect: effectC, start: int = None, end: int = None) -> None:
+        self.start = effect.start if start == None else start
+        self.end = effect.end if end == None else end
         self.effect = effect
-        self.effectID = id(effect)
 
     def __eq__(self, value: 'comparerC') -> bool:
-        return [self.start, self.end, self.effectID] == [value.start, value.end, self.effectID]
+        return self.start == value.start and self.end == value.end and self.effect is value.effect
     def __lt__(self, value: 'comparerC') -> bool:
-        return [self.start, self.end, self.effectID] <  [value.start, value.end, self.effectID]
+        return (self.start, self.end) <  (value.start, value.end)
     def __gt__(self, value: 'comparerC') -> bool:
-        return [self.start, self.end, self.effectID] >  [value.start, value.end, self.effectID]
+        return (self.start, self.end) >  (value.start, value.end)
     def __le__(self, value: 'comparerC') -> bool:
-        return [self.start, self.end, self.effectID] <= [value.start, value.end, self.effectID]
+        return (self.start, self.end) <= (value.start, value.end)
     def __ge__(self, value: 'comparerC') -> bool:
-        return [self.start, self.end, self.effectID] >= [value.start, value.end, self.effectID]
+        return (self.start, self.end) >= (value.start, value.end)
     
 class rangeC(comparerC):
+    __slots__ = ('sve_path', '_frames', '_contribution', 'store', 'slot')
     start: int
     end: int
     effect: effectC
-    frames: set[int]
     sve_path: str
+    store: 'range_store'
+    slot: int
     
-    def __init__(self, effect: effectC, sve_path: str) -> None:
-        super().__init__(effect)
+    def __init__(self, effect: effectC, sve_path: str, start: int = None, end: int = None) -> None:
+        super().__init__(effect, start, end)
         self.sve_path = sve_path
-        self.frames = set()
+        self._frames = set()
+        self._contribution = {}
+        self.store = None
+        self.slot = 0
+
+    # the overlap frames and values are read from the fcurve's range store, until effect_frame_recalc sets them
+    @property
+    def frames(self) -> set[int]:
+        if self._frames == None: self._frames = self.store.frames(self.slot)
+        return self._frames
+    @frames.setter
+    def frames(self, frames: set[int]):
+        self._frames = frames
+
+    @property
+    def contribution(self) -> dict[int, float]:
+        if self._contribution == None: self._contribution = self.store.contribution(self.slot)
+        return self._contribution
+    @contribution.setter
+    def contribution(self, contribution: dict[int, float]):
+        self._contribution = contribution
 
     def __call__(self) -> dict[int, float]:
         vals = self.effect.get_values(self.sve_path)
@@ -209,6 +439,104 @@ class rangeC(comparerC):
 
         return calc_bezier(v1, v2, v3, v4, point)
 
+    # below this many overlap frames the scalar path is faster than building arrays
+    batch_min: int = 16
+
+    interpolate_batch = staticmethod(interpolate_batch)
+
+    @staticmethod
+    def call_all(ranges: list['rangeC']) -> list[dict[int, float]]:
+        # same as [rr() for rr in ranges] but the overlap frames of all ranges are solved at once
+        values = [rr.effect.get_values(rr.sve_path) for rr in ranges]
+        frame_dicts: list[dict[int, float]] = [
+            {rr.start: vals[0], rr.end: vals[1]} for rr, vals in zip(ranges, values)]
+        points = [(ii, ff) for ii, rr in enumerate(ranges) for ff in rr.frames]
+
+        if len(points) < rangeC.batch_min:
+            for ii, ff in points:
+                rr, vals = ranges[ii], values[ii]
+                frame_dicts[ii][ff] = rr.interpolate(rr.start, rr.end, vals[0], vals[1], ff)
+            return frame_dicts
+
+        index = np.fromiter((ii for ii, _ in points), dtype=np.intp, count=len(points))
+        point = np.fromiter((ff for _, ff in points), dtype=np.float64, count=len(points))
+        start_f = np.fromiter((rr.start for rr in ranges), dtype=np.float64, count=len(ranges))
+        end_f = np.fromiter((rr.end for rr in ranges), dtype=np.float64, count=len(ranges))
+        start_val = np.fromiter((vals[0] for vals in values), dtype=np.float64, count=len(ranges))
+        end_val = np.fromiter((vals[1] for vals in values), dtype=np.float64, count=len(ranges))
+
+        result = rangeC.interpolate_batch(
+            start_f[index], end_f[index], start_val[index], end_val[index], point)
+        for (ii, ff), value in zip(points, result.tolist()):
+            frame_dicts[ii][ff] = value
+        return frame_dicts
+
+# the sorted ranges of one fcurve as parallel columns. the overlap frames of range ii, without its own
+# start and end, are points[offsets[ii]:offsets[ii + 1]] and evaluate fills their values alongside.
+# built on every full recalc, the ranges read their frames and contribution from it lazily
+class range_store:
+    starts: 'np.ndarray'
+    ends: 'np.ndarray'
+    offsets: 'np.ndarray'
+    index: 'np.ndarray'
+    points: 'np.ndarray'
+    start_vals: 'np.ndarray'
+    end_vals: 'np.ndarray'
+    values: 'np.ndarray'
+    ranges: list[rangeC]
+
+    def __init__(self, starts: list[int], ends: list[int]) -> None:
+        self.starts = np.array(starts, dtype=np.int64)
+        self.ends = np.array(ends, dtype=np.int64)
+        self.index, self.points = overlap_points(self.starts, self.ends)
+        self.offsets = np.searchsorted(self.index, np.arange(len(starts) + 1))
+        self.values = None
+        self.ranges = []
+
+    @staticmethod
+    def of(ranges: list[rangeC]) -> 'range_store':
+        store = range_store([rr.start for rr in ranges], [rr.end for rr in ranges])
+        store.attach(ranges)
+        return store
+
+    def attach(self, ranges: list[rangeC]):
+        self.ranges = ranges
+        for slot, rr in enumerate(ranges):
+            rr.store = self
+            rr.slot = slot
+            rr._frames = None
+            rr._contribution = None
+
+    def frames(self, slot: int) -> set[int]:
+        return set(self.points[self.offsets[slot]:self.offsets[slot + 1]].tolist())
+
+    def contribution(self, slot: int) -> dict[int, float]:
+        lo, hi = self.offsets[slot], self.offsets[slot + 1]
+        frame_dict = {int(self.starts[slot]): float(self.start_vals[slot]), int(self.ends[slot]): float(self.end_vals[slot])}
+        frame_dict.update(zip(self.points[lo:hi].tolist(), self.values[lo:hi].tolist()))
+        return frame_dict
+
+    def evaluate(self, start_vals: list[float], end_vals: list[float]) -> 'tuple[np.ndarray, np.ndarray]':
+        # keyed frames and their sums, every range adds its start, end and overlap frame values.
+        # summed in range order like keyframes_patch does so both give the same floats
+        count = len(self.starts)
+        self.start_vals = np.asarray(start_vals, dtype=np.float64)
+        self.end_vals = np.asarray(end_vals, dtype=np.float64)
+        index = self.index
+        if len(index) > 0:
+            self.values = interpolate_batch(self.starts[index], self.ends[index],
+                                            self.start_vals[index], self.end_vals[index], self.points)
+        else:
+            self.values = np.empty(0, dtype=np.float64)
+        for rr in self.ranges: rr._contribution = None
+
+        owner = np.concatenate([np.arange(count), np.arange(count), index])
+        order = np.argsort(owner, kind='stable')
+        frames = np.concatenate([self.starts, self.ends, self.points])[order]
+        weights = np.concatenate([self.start_vals, self.end_vals, self.values])[order]
+        keys, inverse = np.unique(frames, return_inverse=True)
+        return keys, np.bincount(inverse, weights=weights, minlength=len(keys))
+
 
 class fcurveC:
     all: dict[str, 'fcurveC'] = {}
@@ -220,21 +548,44 @@ class fcurveC:
     modifiers: list[comparerC]
     datapath: str
     default: float
+    # index over the sorted keyframes, kept for effect_frame_recalc
+    ranges: dict[effectC, rangeC]
+    # columns of the keyframes as of the last full recalc, None once effect_frame_recalc moved one
+    store: range_store
+    max_length: int
+    frame_values: dict[int, float]
+    frame_keys: list[int]
+    modifier_keys: list[tuple[str, effectC]]
+    modifier_written: int = 0
+    modifier_skipped: int = 0
+    # bumped whenever the keyframes or modifiers are written, evaluated holds (frame, revision, value)
+    revision: int
+    revisions: int = 0
+    evaluated: tuple[int, int, float] = None
+    evaluate_hits: int = 0
+    evaluate_misses: int = 0
 
     def __init__(self, sve_path: str) -> None:
         self.path = sve.props[sve_path].path
         self.sve_path = sve_path
         self.datapath = get_from_path(G.edit_strip, self.path, lambda base, prop: base.path_from_id( prop ))
-        G.action.fcurves.new( self.datapath )
+        G.paths.add(G.edit_scene, 'fcurves', G.action.fcurves.new( self.datapath ))
         self.effects = set()
         self.keyframes = []
         self.modifiers = []
+        self.ranges = {}
+        self.store = None
+        self.max_length = 0
+        self.frame_values = {}
+        self.frame_keys = []
+        self.modifier_keys = []
+        self.revision = 0
         self.all[sve_path] = self
         self.default = self.value
     
         def notify(*args, **kwargs):
             if G.edit_strip.select or bpy.context.active_sequence_strip == G.edit_strip:
-                self.if_not_on_fcurve()
+                self.recalc_request('on_fcurve')
                 pass
             # printc('change '+self.sve_path)
             pass
@@ -246,125 +597,309 @@ class fcurveC:
             
 
 
-    def get_keyframes_modifiers(self) -> tuple[list[rangeC], list[comparerC], ]:
-        keyframes: list[rangeC] = []
-        modifiers: list[comparerC] = []
-        
-        for effect in self.effects:
+    def sorted_effects(self) -> tuple[list[effectC], list[int], list[int], list[comparerC]]:
+        columns = ([], [], [], [])
+        self.read_effects(self.effects, *columns)
+        return self.sort_effects(*columns)
+
+    @staticmethod
+    def read_effects(effects, keyed: list[effectC], starts: list[int], ends: list[int], modifiers: list[comparerC]):
+        # the keyframe effects with their start and end, read from the strips once
+        for effect in effects:
             if effect.modifier:
                 modifiers.append(comparerC(effect))
             else:
-                keyframes.append(rangeC(effect, self.sve_path))
-        
-        modifiers.sort()
-
-        if len(keyframes) <= 1:
-            return keyframes, modifiers
-        keyframes.sort()
-
-        for fr0 in range(len(keyframes) - 1):
-            kf0 = keyframes[fr0]
-            for fr1 in range(fr0 + 1, len(keyframes)):
-                kf1 = keyframes[fr1]
-                # if start of next is less then end of previous -> overlap
-                if kf1.start <= kf0.end:
-                    kf0.frames.add( kf1.start )
-                    if kf1.end <= kf0.end:
-                        kf0.frames.add( kf1.end )
-                    else:
-                        kf1.frames.add( kf0.end )
-        return keyframes, modifiers
-    
-    def frame_recalc(self):
-        new_kf, new_mf = self.get_keyframes_modifiers()
-        if self.keyframes != new_kf or len(new_kf) == 0:
-            self.keyframes.clear()
-            self.keyframes = new_kf
-            self.keyframes_value_recalc()
+                keyed.append(effect)
+                starts.append(effect.start)
+                ends.append(effect.end)
+
+    @staticmethod
+    def sort_effects(keyed: list[effectC], starts: list[int], ends: list[int], modifiers: list[comparerC]
+                     ) -> tuple[list[effectC], list[int], list[int], list[comparerC]]:
+        modifiers.sort(key=comparerC.sort_key)
+        order = np.lexsort((ends, starts)).tolist() if keyed else []
+        return [keyed[ii] for ii in order], [starts[ii] for ii in order], [ends[ii] for ii in order], modifiers
+
+    def ranges_from(self, effects: list[effectC], starts: list[int], ends: list[int], reuse: bool = True,
+                    store: range_store = None) -> list[rangeC]:
+        keyframes: list[rangeC] = []
+        for effect, start, end in zip(effects, starts, ends):
+            rr = self.ranges.get(effect) if reuse else None
+            if rr is None:
+                rr = rangeC(effect, self.sve_path, start, end)
+            else:
+                rr.start, rr.end = start, end
+            keyframes.append(rr)
+        store = store or range_store(starts, ends)
+        store.attach(keyframes)
+        if reuse: self.store = store
+        return keyframes
+
+    def keyframes_same(self, effects: list[effectC], starts: list[int], ends: list[int]) -> bool:
+        if len(effects) != len(self.keyframes): return False
+        for rr, effect, start, end in zip(self.keyframes, effects, starts, ends):
+            if rr.effect is not effect or rr.start != start or rr.end != end: return False
+        return True
+
+    @profiler.timed
+    def frame_recalc(self) -> set[str]:
+        return run_steps(self.frame_steps())
+
+    # frame_recalc in steps for the sliced recalc, yields after every chunk of effects read from the strips.
+    # nothing is written before the last step, a job dropped in between leaves the fcurve as it was
+    def frame_steps(self, chunk: int = 0):
+        done: set[str] = set()
+        effects = list(self.effects)
+        chunk = chunk or max(len(effects), 1)
+        columns = ([], [], [], [])
+        for lo in range(0, len(effects), chunk):
+            self.read_effects(effects[lo:lo + chunk], *columns)
+            yield
+        keyed, starts, ends, new_mf = self.sort_effects(*columns)
+        if len(keyed) == 0 or not self.keyframes_same(keyed, starts, ends):
+            values: list[tuple[float, float]] = []
+            for lo in range(0, len(keyed), chunk):
+                values += [effect.get_values(self.sve_path) for effect in keyed[lo:lo + chunk]]
+                yield
+            store = range_store(starts, ends)
+            yield
+            self.keyframes = self.ranges_from(keyed, starts, ends, store=store)
+            self.index_rebuild()
+            self.keyframes_value_recalc(values)
+            done.add('keyframes')
         if self.modifiers != new_mf:
             self.modifiers.clear()
             self.modifiers = new_mf
             self.modifiers_value_recalc()
+            done.add('modifiers')
+        return done
+
+    def recalc_request(self, kind: str):
+        recalc_queue.request(self.sve_path, kind)
         
             
 
-    def keyframes_value_recalc(self):
-        frames: dict[int, float] = {}
+    def index_rebuild(self):
+        self.ranges = {rr.effect: rr for rr in self.keyframes}
+        self.max_length = max([rr.end - rr.start for rr in self.keyframes], default=0)
+
+    def overlapping(self, start: int, end: int) -> list[int]:
+        # indices of the ranges intersecting [start, end], no range starts before start - max_length
+        keyframes = self.keyframes
+        lo = bisect_left(keyframes, start - self.max_length, key=lambda rr: rr.start)
+        hi = bisect_right(keyframes, end, key=lambda rr: rr.start)
+        return [ii for ii in range(lo, hi) if keyframes[ii].end >= start]
+
+    def effects_in(self, start: int, end: int) -> list[effectC]:
+        effects = [self.keyframes[ii].effect for ii in self.overlapping(start, end)]
+        return effects + [mm.effect for mm in self.modifiers if mm.start <= end and mm.end >= start]
+
+    # the keyframe effects before and after effect in (start, end) order
+    def neighbours(self, effect: effectC) -> tuple[effectC, effectC]:
+        keyframes = self.keyframes
+        rr = self.ranges[effect]
+        index = bisect_left(keyframes, (rr.start, rr.end), key=lambda kf: (kf.start, kf.end))
+        while keyframes[index] is not rr: index += 1
+        return (keyframes[index - 1].effect if index > 0 else None,
+                keyframes[index + 1].effect if index + 1 < len(keyframes) else None)
+
+    def range_frames(self, index: int) -> set[int]:
+        # the overlap frames of one range from its neighbours only, as range_store gives them
+        keyframes = self.keyframes
+        kf0 = keyframes[index]
+        frames: set[int] = set()
+        for ii in range(index + 1, len(keyframes)):
+            kf1 = keyframes[ii]
+            if kf1.start > kf0.end: break
+            frames.add( kf1.start )
+            if kf1.end <= kf0.end:
+                frames.add( kf1.end )
+        lo = bisect_left(keyframes, kf0.start - self.max_length, key=lambda rr: rr.start)
+        for ii in range(lo, index):
+            kfp = keyframes[ii]
+            if kf0.start <= kfp.end < kf0.end:
+                frames.add( kfp.end )
+        frames.discard(kf0.start)
+        frames.discard(kf0.end)
+        return frames
+
+    @profiler.timed
+    def effect_frame_recalc(self, effect: effectC):
+        # frame_recalc for one moved effect, only the ranges overlapping its old and new interval are redone
+        if recalc_queue.restart(self.sve_path): return
+        if effect.modifier or effect not in self.ranges or len(self.frame_keys) == 0:
+            return self.frame_recalc()
+        moved = self.ranges[effect]
+        start, end = effect.start, effect.end
+        if moved.start == start and moved.end == end: return
+
+        old_start, old_end = moved.start, moved.end
+        lo = bisect_left(self.keyframes, old_start, key=lambda rr: rr.start)
+        while self.keyframes[lo] is not moved: lo += 1
+        del self.keyframes[lo]
+        moved.start, moved.end = start, end
+        insort(self.keyframes, moved, key=lambda rr: (rr.start, rr.end))
+        self.max_length = max(self.max_length, end - start)
+        self.store = None
+
+        indices = sorted(set(self.overlapping(old_start, old_end)) | set(self.overlapping(start, end)))
+        affected = [self.keyframes[ii] for ii in indices]
+        touched: set[int] = set()
+        for ii, rr in zip(indices, affected):
+            touched.update(rr.contribution)
+            rr.frames = self.range_frames(ii)
+        for rr, frame_dict in zip(affected, rangeC.call_all(affected)):
+            rr.contribution = frame_dict
+            touched.update(frame_dict)
+
+        self.keyframes_patch(touched)
+
+    @profiler.timed
+    def keyframes_patch(self, touched: set[int]):
+        # re-sums the touched frames in keyframes order and writes only the keyframe points that changed
         fcurve_kfp = self.fcurve.keyframe_points
+        if len(fcurve_kfp) != len(self.frame_keys):
+            return self.keyframes_value_recalc()
 
-        def add(k:int, v:float):
-            if k in frames: frames[k] += v
-            else: frames[k] = v
-        
-        for rr in self.keyframes:
-            for frame, value in rr().items():
-                add(frame, value)
-        
+        removed: list[int] = []
+        changed: dict[int, float] = {}
+        for frame in touched:
+            total = None
+            for ii in self.overlapping(frame, frame):
+                contribution = self.keyframes[ii].contribution
+                if frame in contribution:
+                    total = contribution[frame] if total is None else total + contribution[frame]
+            if total is None:
+                if frame in self.frame_values: removed.append(frame)
+            elif self.frame_values.get(frame) != total:
+                changed[frame] = total
+
+        profiler.write(len(removed))
+        if removed or changed: self.touch()
+        for frame in sorted(removed, reverse=True):
+            index = bisect_left(self.frame_keys, frame)
+            fcurve_kfp.remove(fcurve_kfp[index], fast=True)
+            del self.frame_keys[index]
+            del self.frame_values[frame]
+
+        for frame in sorted(changed):
+            if frame in self.frame_values:
+                point = fcurve_kfp[bisect_left(self.frame_keys, frame)]
+            else:
+                point = fcurve_kfp.insert(float(frame), changed[frame], options={'FAST'})
+                insort(self.frame_keys, frame)
+            self.keyframe_set(point, frame, changed[frame])
+            self.frame_values[frame] = changed[frame]
+
+    @staticmethod
+    def keyframe_set(point, frame: int, value: float):
+        profiler.write(3)
+        point.co = [float(frame), value, ]
+        point.handle_left = [float(frame) - 5.0, value, ]
+        point.handle_right = [float(frame) + 5.0, value, ]
+
+    @profiler.timed
+    def keyframes_value_recalc(self, values: list[tuple[float, float]] = None):
+        fcurve = self.fcurve
+        fcurve_kfp = fcurve.keyframe_points
+        if self.store == None:
+            self.store = range_store.of(self.keyframes)
+
+        if values == None:
+            values = [rr.effect.get_values(self.sve_path) for rr in self.keyframes]
+        keys, sums = self.store.evaluate([vals[0] for vals in values], [vals[1] for vals in values])
+        keys, sums = keys.tolist(), sums.tolist()
         if len(self.keyframes) == 0 and len(self.modifiers) > 0:
-            add(G.edit_strip.frame_start, self.default )
+            keys, sums = [G.edit_strip.frame_start], [self.default]
+
+        self.frame_values = dict(zip(keys, sums))
+        self.frame_keys = keys
+
+        co = np.empty(len(keys) * 2, dtype=np.float32)
+        co[0::2] = keys
+        co[1::2] = sums
 
-        
         kplen = len(fcurve_kfp)
-        if len(frames) > kplen:
-            fcurve_kfp.add(len(frames) - kplen)
-        elif len(frames) < kplen:
-            for ii in range(kplen - len(frames)):
+        if kplen == len(keys) and np.array_equal(keyframes_get(fcurve_kfp), co):
+            return
+        self.touch()
+        if len(keys) > kplen:
+            fcurve_kfp.add(len(keys) - kplen)
+        elif len(keys) < kplen:
+            for ii in range(kplen - len(keys)):
                 fcurve_kfp.remove(fcurve_kfp[-1], fast=True)
-        fcurve_kfp.sort()
-        keys: list = list(frames.keys())
-        keys.sort()
-
-        for iik in range(len(frames)):
-            if list(fcurve_kfp[iik].co) != [float(keys[iik]), frames[keys[iik]], ]:
-                fcurve_kfp[iik].co = [float(keys[iik]), frames[keys[iik]], ]
-                fcurve_kfp[iik].handle_left = [float(keys[iik]) - 5.0, frames[keys[iik]], ]
-                fcurve_kfp[iik].handle_right = [float(keys[iik]) + 5.0, frames[keys[iik]], ]
+        profiler.write(abs(len(keys) - kplen) + 3 * len(keys))
+        if len(keys) == 0: return
 
+        handle = co.copy()
+        keyframes_set(fcurve_kfp, 'co', co)
+        handle[0::2] = co[0::2] - 5.0
+        keyframes_set(fcurve_kfp, 'handle_left', handle)
+        handle[0::2] = co[0::2] + 5.0
+        keyframes_set(fcurve_kfp, 'handle_right', handle)
         fcurve_kfp.sort()
     
+    @profiler.timed
     def modifiers_value_recalc(self):
-        G.set_random = id(self.fcurve)
-        fmod = list(self.fcurve.modifiers)
-        smod = self.modifiers.copy()
-        for ffm in fmod.copy():
-            for ssm in smod.copy():
-                if ssm.effect.modifier['type'] != ffm.type: continue
-                ffm.frame_start = ssm.start
-                ffm.frame_end = ssm.end
-                ssm.effect.atype.to_modifier(ffm, ssm.effect)
-                fmod.remove(ffm)
-                smod.remove(ssm)
-        
-        for ffm in fmod.copy():
-            for ssm in smod.copy():
-                if ssm.effect.modifier['type'] != ffm.type: continue
-                ffm.frame_start = ssm.start
-                ffm.frame_end = ssm.end
-                ssm.effect.atype.to_modifier(ffm, ssm.effect)
-                fmod.remove(ffm)
-                smod.remove(ssm)
-        for ffm in fmod:
-            self.fcurve.modifiers.remove(ffm)
-
-        for ssm in smod:
-            newfm = self.fcurve.modifiers.new(ssm.effect.modifier['type'])
-            ssm.effect.atype.to_modifier(newfm, ssm.effect)
-            newfm.frame_start = ssm.start
-            newfm.frame_end = ssm.end
+        # fcurve modifiers are keyed by (type, effect), modifier_keys holds the keys in the fcurve's order.
+        # unkeyed modifiers are reused by type, only the properties that differ are written
+        G.set_random = crc32(self.datapath.encode())
+        fmodifiers = self.fcurve.modifiers
+        current = list(fmodifiers)
+        keyed: dict[tuple, object] = {}
+        if len(current) == len(self.modifier_keys):
+            for key, ffm in zip(self.modifier_keys, current):
+                if key[0] == ffm.type: keyed[key] = ffm
+        taken = {id(ffm) for ffm in keyed.values()}
+        spare: dict[str, list] = {}
+        for ffm in current:
+            if id(ffm) not in taken: spare.setdefault(ffm.type, []).append(ffm)
 
+        assigned: dict[int, tuple] = {}
+        created: list[tuple] = []
+        written, skipped = 0, 0
+        for ssm in self.modifiers:
+            props = ssm.effect.modifier
+            key = (props['type'], ssm.effect)
+            ffm = keyed.pop(key, None)
+            if ffm == None and spare.get(key[0]):
+                ffm = spare[key[0]].pop(0)
+            if ffm == None:
+                ffm = fmodifiers.new(key[0])
+                created.append(key)
+            else:
+                assigned[id(ffm)] = key
+            ww, ss = modifier_default.sync(ffm, props)
+            written, skipped = written + ww, skipped + ss
+            for pp, value in [('frame_start', ssm.start), ('frame_end', ssm.end)]:
+                if getattr(ffm, pp) == value:
+                    skipped += 1
+                else:
+                    setattr(ffm, pp, value)
+                    written += 1
 
+        for ffm in list(keyed.values()) + [ffm for ffms in spare.values() for ffm in ffms]:
+            fmodifiers.remove(ffm)
+            written += 1
+        self.modifier_keys = [assigned[id(ffm)] for ffm in current if id(ffm) in assigned] + created
+        if written: self.touch()
+        fcurveC.modifier_written += written
+        fcurveC.modifier_skipped += skipped
+        profiler.write(written)
 
     def add_effect(self, effect: effectC):
+        recalc_queue.restart(self.sve_path)
         self.effects.add(effect)
         
     def remove_effect(self, effect: effectC):
+        recalc_queue.restart(self.sve_path)
         if effect in self.effects:
             self.effects.remove(effect)
 
-    def if_not_on_fcurve(self):
+    def if_not_on_fcurve(self) -> bool:
         curr = self.value
         prev = self.evaluate
-        if curr == prev: return
+        if curr == prev: return False
         diff = curr - prev
         for eff in self.effects:
             if not eff.modifier:
@@ -372,6 +907,7 @@ class fcurveC:
                 eff.set_values(self.sve_path, vals[0] + diff, vals[1] + diff)
         self.default = curr
         self.keyframes_value_recalc()
+        return True
 
 
 
@@ -379,15 +915,150 @@ class fcurveC:
     def fcurve(self):
         return G.action.fcurves.find(self.datapath)
     
+    def touch(self):
+        self.revision += 1
+        fcurveC.revisions += 1
+
+    # undo/redo brings back older keyframe points, the ranges and frame keys no longer describe them.
+    # they are recalculated in full, which also rebuilds the index behind overlapping and effects_in
+    def forget(self):
+        self.keyframes = []
+        self.modifiers = []
+        self.modifier_keys = []
+        self.store = None
+        self.frame_values = {}
+        self.frame_keys = []
+        self.index_rebuild()
+        self.touch()
+        recalc_queue.restart(self.sve_path)
+
+    @staticmethod
+    def forget_all():
+        for fcurve in fcurveC.all.values(): fcurve.forget()
+
     @property
     def evaluate(self):
-        return self.fcurve.evaluate(G.edit_scene.frame_current)
+        frame = G.edit_scene.frame_current
+        evaluated = self.evaluated
+        if evaluated != None and evaluated[0] == frame and evaluated[1] == self.revision:
+            fcurveC.evaluate_hits += 1
+            return evaluated[2]
+        fcurveC.evaluate_misses += 1
+        value = self.fcurve.evaluate(frame)
+        self.evaluated = (frame, self.revision, value)
+        return value
 
     @property
     def value(self):
         return get_from_path(G.edit_strip, self.path, lambda base, prop: getattr(base, prop) )
     
-    def recalc_all(self = None):
-        for _, fcurve in fcurveC.all.items():
-            fcurve.frame_recalc()
+    # sliced leaves the fcurves to the scheduler, they are recalculated over the next ticks
+    def recalc_all(self = None, sliced: bool = False):
+        for sve_path in fcurveC.all:
+            recalc_queue.request(sve_path, 'frame')
+        if not sliced: recalc_queue.flush()
+
+def run_steps(steps):
+    while True:
+        try: next(steps)
+        except StopIteration as stop: return stop.value
+
+# recalc requests deduped per sve_path, flushed once per tick by the scheduler or at operator end.
+# a tick only spends budget seconds and leaves the rest for the next ones, an fcurve with many effects
+# is done as a job over several ticks. the fcurves of the effects under the playhead go first,
+# then the ones in the timeline view
+class recalc_queue:
+    pending: dict[str, set[str]]
+    # sve_path: (kinds, steps) of the fcurves started in an earlier tick
+    jobs: dict[str, tuple[set[str], object]]
+    budget: float = 0.02
+    chunk: int = 200
+    requested: int = 0
+    merged: int = 0
+    flushed: int = 0
+    sliced: int = 0
+
+    def __init__(self) -> None:
+        self.pending = {}
+        self.jobs = {}
+
+    def request(self, sve_path: str, kind: str):
+        kinds = self.pending.setdefault(sve_path, set())
+        # a job reads the effects over several ticks, it is started over with what it was doing
+        job = self.jobs.pop(sve_path, None)
+        if job != None: kinds |= job[0]
+        self.requested += 1
+        if kind in kinds: self.merged += 1
+        kinds.add(kind)
+        scheduler.mark('recalc')
+
+    def restart(self, sve_path: str) -> bool:
+        if sve_path not in self.jobs: return False
+        self.request(sve_path, 'frame')
+        return True
+
+    # the scheduler check, True while fcurves are still pending
+    def tick(self) -> bool:
+        return self.flush(self.budget)
+
+    @profiler.timed
+    def flush(self, budget: float = None) -> bool:
+        if G.edit_strip == None:
+            self.clear()
+            return False
+        tt = perf_counter()
+        order = list(self.jobs) + list(self.pending) if budget == None else self.ordered()
+        for sve_path in order:
+            if budget != None and perf_counter() - tt > budget:
+                self.sliced += 1
+                return True
+            job = self.jobs.pop(sve_path, None)
+            if job == None:
+                kinds = self.pending.pop(sve_path, None)
+                fcurve = fcurveC.all.get(sve_path)
+                if fcurve == None or kinds == None: continue
+                self.flushed += 1
+                job = (kinds, self.steps(fcurve, kinds, 0 if budget == None else self.chunk))
+            if budget == None:
+                run_steps(job[1])
+                continue
+            for _ in job[1]:
+                if perf_counter() - tt > budget:
+                    self.jobs[sve_path] = job
+                    self.sliced += 1
+                    return True
+        return False
+
+    @staticmethod
+    def steps(fcurve: fcurveC, kinds: set[str], chunk: int):
+        if 'on_fcurve' in kinds and fcurve.if_not_on_fcurve():
+            kinds.discard('keyframes')
+        if 'frame' in kinds:
+            kinds -= yield from fcurve.frame_steps(chunk)
+        if 'keyframes' in kinds:
+            fcurve.keyframes_value_recalc()
+        if 'modifiers' in kinds:
+            fcurve.modifiers_value_recalc()
+
+    def ordered(self) -> list[str]:
+        frame = G.edit_scene.frame_current
+        current = effectC.index.at(frame) + effect_record.index.at(frame)
+        shown = []
+        if effect_record.view != None:
+            start, end = effect_record.view
+            shown = effectC.index.in_range(start, end) + effect_record.in_view(start, end)
+        rank: dict[str, int] = {}
+        for order, effects in enumerate([shown, current]):
+            for effect in effects:
+                for fcurve in effect.fcurves: rank[fcurve.sve_path] = -order - 1
+        return list(self.jobs) + sorted(self.pending, key=lambda sve_path: rank.get(sve_path, 0))
+
+    def clear(self):
+        self.pending.clear()
+        self.jobs.clear()
+
+    @property
+    def counters(self) -> dict[str, int]:
+        return {'requested': self.requested, 'merged': self.merged, 'flushed': self.flushed, 'sliced': self.sliced}
+recalc_queue = recalc_queue()
 
@@ -3,6 +3,137 @@ import bpy
 from os import path
 from random import seed, random
 from tempfile import gettempdir
+from typing import Callable
+
+# scene/strip handles by (kind, scene name, ..., name). strips are not ID datablocks, a removed strip leaves
+# its python handle pointing at freed data without raising, and msgbus callbacks run before depsgraph_update_post.
+# so a cached handle is never read: every get resolves the name again (sequences_all is hashed by name, unlike
+# sequences) and the cached handle is only returned while it still wraps the same pointer. the handles are
+# also dropped on depsgraph updates, undo, load and the addon's own strip removals
+class handle_cache:
+    handles: dict[tuple, tuple[object, int]]
+    hits: int = 0
+    lookups: int = 0
+    replaced: int = 0
+    invalidations: int = 0
+
+    def __init__(self) -> None:
+        self.handles = {}
+
+    def get(self, key: tuple, resolve: Callable):
+        self.lookups += 1
+        handle = resolve()
+        if handle == None:
+            self.handles.pop(key, None)
+            return None
+        pointer = handle.as_pointer()
+        entry = self.handles.get(key)
+        if entry != None and entry[1] == pointer:
+            self.hits += 1
+            return entry[0]
+        if entry != None: self.replaced += 1
+        self.handles[key] = (handle, pointer)
+        return handle
+
+    def invalidate(self):
+        if self.handles: self.invalidations += 1
+        self.handles.clear()
+
+    @property
+    def counters(self) -> dict[str, int]:
+        return {'hits': self.hits, 'lookups': self.lookups, 'replaced': self.replaced,
+                'invalidations': self.invalidations}
+
+# (data_path, array_index) of the fcurves and drivers of a scene by the strip they animate, so the curves
+# of one strip are removed without a substring scan over all of them. built on first use per (scene, kind),
+# kept up to date by the addon's own adds and removes. a strip rename rewrites the paths without changing
+# the count, so the index is dropped on every depsgraph update, undo and load. within one update a
+# collection whose size no longer matches the count, curves added or removed outside the addon, is built again
+class path_index:
+    prefix: str = 'sequence_editor.sequences_all["'
+    owners: dict[tuple[str, str], dict[str, set[tuple[str, int]]]]
+    counts: dict[tuple[str, str], int]
+    builds: int = 0
+    removed: int = 0
+
+    def __init__(self) -> None:
+        self.owners = {}
+        self.counts = {}
+
+    @staticmethod
+    def collection(scene, kind: str):
+        animation_data = scene.animation_data
+        if animation_data == None: return None
+        if kind == 'drivers': return animation_data.drivers
+        if animation_data.action == None: return None
+        return animation_data.action.fcurves
+
+    @staticmethod
+    def owner(data_path: str) -> str:
+        if not data_path.startswith(path_index.prefix): return None
+        start = len(path_index.prefix)
+        end = data_path.find('"]', start)
+        while end > 0 and data_path[end - 1] == '\\':
+            end = data_path.find('"]', end + 1)
+        if end < 0: return None
+        return data_path[start:end].replace('\\"', '"').replace('\\\\', '\\')
+
+    def paths(self, scene, kind: str) -> dict[str, set[tuple[str, int]]]:
+        curves = self.collection(scene, kind)
+        if curves == None: return {}
+        key = (scene.name, kind)
+        owners = self.owners.get(key)
+        if owners == None or self.counts[key] != len(curves):
+            self.builds += 1
+            owners = self.owners[key] = {}
+            for fc in curves:
+                name = self.owner(fc.data_path)
+                if name != None: owners.setdefault(name, set()).add((fc.data_path, fc.array_index))
+            self.counts[key] = len(curves)
+        return owners
+
+    def add(self, scene, kind: str, *fcurves):
+        key = (scene.name, kind)
+        owners = self.owners.get(key)
+        if owners == None: return
+        for fc in fcurves:
+            name = self.owner(fc.data_path)
+            entry = (fc.data_path, fc.array_index)
+            if name == None or entry in owners.get(name, ()): continue
+            owners.setdefault(name, set()).add(entry)
+            self.counts[key] += 1
+
+    # after the collection removed every index of data_path itself
+    def discard(self, scene, kind: str, data_path: str):
+        key = (scene.name, kind)
+        owned = self.owners.get(key, {}).get(self.owner(data_path))
+        if not owned: return
+        entries = {entry for entry in owned if entry[0] == data_path}
+        owned -= entries
+        self.counts[key] -= len(entries)
+
+    def remove(self, scene, kind: str, *names: str) -> int:
+        curves = self.collection(scene, kind)
+        if curves == None: return 0
+        owners = self.paths(scene, kind)
+        removed = 0
+        for name in names:
+            for data_path, index in owners.pop(name, ()):
+                fc = curves.find(data_path, index=index)
+                if fc == None: continue
+                curves.remove(fc)
+                removed += 1
+        self.counts[(scene.name, kind)] -= removed
+        self.removed += removed
+        return removed
+
+    def clear(self):
+        self.owners.clear()
+        self.counts.clear()
+
+    @property
+    def counters(self) -> dict[str, int]:
+        return {'builds': self.builds, 'removed': self.removed}
 
 class _G:
     strips: set[str] = set()
@@ -12,6 +143,8 @@ class _G:
     
     dir_temp: str = gettempdir()+'/sve_bl_addon_imgs'
     _set_random: float = 0.0
+    handles: handle_cache = handle_cache()
+    paths: path_index = path_index()
 
     @property
     def TEMPSCENE(self):
@@ -22,6 +155,9 @@ class _G:
     @property
     def SEQUENCER_MT_SVEEffects_startend(self):
         return 'SEQUENCER_MT_SVEEffects_startend'
+    @property
+    def SEQUENCER_MT_SVEEffects_Presets(self):
+        return 'SEQUENCER_MT_SVEEffects_Presets'
     
     @property
     def set_random(self) -> float:
@@ -35,35 +171,44 @@ class _G:
 
     @property
     def edit_strip(self) -> object:
-        scene = self.edit_scene
-        if self._edit_strip_name != None and scene != None and self._edit_strip_name in scene.sequence_editor.sequences:
-            return scene.sequence_editor.sequences[self._edit_strip_name]
-        return None
+        if self._edit_strip_name == None: return None
+        return self.strip(self._edit_strip_name)
 
     @property
     def orig_strip(self) -> object:
-        scene = self.edit_scene
-        if self._orig_strip_name != None and scene != None and self._orig_strip_name in scene.sequence_editor.sequences_all:
-            return scene.sequence_editor.sequences_all[self._orig_strip_name]
-        return None
+        if self._orig_strip_name == None: return None
+        return self.strip(self._orig_strip_name)
 
     @property
     def edit_scene(self) -> object:
-        if self._edit_scene_name != None and self._edit_scene_name in bpy.data.scenes:
-            return bpy.data.scenes[self._edit_scene_name]
-        return None
+        if self._edit_scene_name == None: return None
+        return self.handles.get(('scene', self._edit_scene_name), self._resolve_edit_scene)
+
+    def strip(self, name: str) -> object:
+        return self.handles.get(('sequences_all', self._edit_scene_name, name), lambda: self._resolve_strip(name))
+
+    def _resolve_strip(self, name: str) -> object:
+        scene = self.edit_scene
+        if scene == None or scene.sequence_editor == None: return None
+        return scene.sequence_editor.sequences_all.get(name)
+
+    def _resolve_edit_scene(self) -> object:
+        return bpy.data.scenes.get(self._edit_scene_name)
 
     @edit_strip.setter
     def edit_strip(self, name: str):
         self._edit_strip_name = name
+        self.handles.invalidate()
 
     @orig_strip.setter
     def orig_strip(self, name: str):
         self._orig_strip_name = name
+        self.handles.invalidate()
 
     @edit_scene.setter
     def edit_scene(self, name: str):
         self._edit_scene_name = name
+        self.handles.invalidate()
 
 
     @property
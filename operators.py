@@ -2,15 +2,18 @@
 
 import bpy
 import re
+import json
 from traceback import format_exc
 from .sve_struct import sve, anim_base, modifier_default
-from .effect_fcurve import effectC, fcurveC
+from .effect_fcurve import effectC, effect_record, fcurveC, recalc_queue
 from .utility import printc, get_by_area, immutable_change, driver_to_zero, \
-    get_from_path, create_none_img, add_driver, remove_driver, fcurve_paths
+    get_from_path, create_none_img, add_driver, remove_driver, fcurve_paths, keyframes_copy, bake_noise
 from .globals import G
+from .profiler import profiler
 
 
 
+@profiler.timed
 def lock_tempscene():
     bpy.msgbus.clear_by_owner(G.edit_scene)
 
@@ -24,6 +27,7 @@ def lock_tempscene():
     for channel_name in ['Channel 1','Channel 2']:
         channel = G.edit_scene.sequence_editor.channels[channel_name]
         channel.lock = True
+        profiler.write()
         bpy.msgbus.subscribe_rna(
             key=channel.path_resolve('lock',False),
             owner=G.edit_scene, args=(1,), options={'PERSISTENT',},
@@ -38,6 +42,7 @@ def lock_tempscene():
         if strip.channel == 1:
             for prop in properties:
                 driver_to_zero(strip, prop.split('.'))
+                profiler.write()
             break
 
     def notify(*args, **kwargs):
@@ -54,6 +59,41 @@ def lock_tempscene():
             notify=notify )
 
 
+# the open session is recorded on the scenes, saved with the file whether or not its ui is loaded. the scene
+# holding the session has the edit strip's name, every other scene an empty name for no session. only files
+# saved before the marker existed, no scene has one, are scanned for the channel 2 strip with a strip source
+def mark_session(scene_name: str = None, strip_name: str = None):
+    for scene in bpy.data.scenes:
+        marker = strip_name if scene.name == scene_name else ''
+        if scene.get(sve.session) != marker: scene[sve.session] = marker
+
+def session_strip(scene, strip):
+    if scene == None or strip == None or scene.sequence_editor == None: return None
+    if strip.channel == 2 and sve.strip_source in strip:
+        if strip[sve.strip_source] in scene.sequence_editor.sequences_all:
+            return strip
+    return None
+
+@profiler.timed
+def find_session() -> tuple | None:
+    marked = False
+    for scene in bpy.data.scenes:
+        marker = scene.get(sve.session)
+        if marker == None: continue
+        marked = True
+        if marker and scene.sequence_editor:
+            strip = session_strip(scene, scene.sequence_editor.sequences.get(marker))
+            if strip: return scene, strip
+    if marked: return None
+
+    for scene in bpy.data.scenes:
+        if scene.sequence_editor == None: continue
+        for strip in scene.sequence_editor.sequences:
+            if session_strip(scene, strip):
+                return scene, strip
+    return None
+
+
 def stringify_effect(effect: effectC, offset: int):
     string = 's' + str(effect.start - offset) + \
              'e' + str(effect.end   - offset) + ';' + effect.type + ';'
@@ -81,6 +121,60 @@ def parse_effect(string: str, offset: int):
     
     return mdict
 
+# all effects of a strip in one versioned json blob, replaces the sveeffect_* strings
+effect_store_version = 1
+
+# a row is [name, start, end, type, props] with start/end relative to offset
+def effect_rows(effects: list[effectC], offset: int) -> list[list]:
+    return [[effect.name, effect.start - offset, effect.end - offset, effect.type, effect.atype.to_dict(effect)]
+            for effect in effects if effect.type in anim_base.all]
+
+def parse_effect_rows(rows: list[list], offset: int) -> list[tuple[str, dict]]:
+    return [(name, {
+                'start': start + offset,
+                'end': end + offset,
+                'type': type,
+                'props': {prop: value for prop, value in props.items() if prop in sve.props},
+            }) for name, start, end, type, props in rows if type in anim_base.all]
+
+def dump_effects(effects: list[effectC], offset: int) -> str:
+    return json.dumps({
+        'version': effect_store_version,
+        'effects': effect_rows(effects, offset),
+    }, separators=(',', ':'))
+
+# a store that can't be read raises ValueError, the callers refuse to go on so it is never overwritten
+def parse_effects(string: str, offset: int) -> list[tuple[str, dict]]:
+    try:
+        store = json.loads(string)
+    except json.JSONDecodeError as e:
+        raise ValueError('the effect store is not valid json: %s' % e)
+    if not isinstance(store, dict) or store.get('version') != effect_store_version:
+        raise ValueError('the effect store has version %r, this addon reads version %d' % (
+            store.get('version') if isinstance(store, dict) else None, effect_store_version))
+    return parse_effect_rows(store['effects'], offset)
+
+# effect records that are not materialized yet are kept on the edit strip, for reinstate
+def store_effect_records() -> bool:
+    if G.edit_strip == None: return False
+    if len(effect_record.all) > 0:
+        G.edit_strip[sve.effect_store] = dump_effects(effect_record.all.values(), 0)
+    elif sve.effect_store in G.edit_strip:
+        del G.edit_strip[sve.effect_store]
+    return False
+
+# effects stored on a strip, legacy sveeffect_* strings are read when not in the store
+def load_effects(strip, offset: int) -> list[tuple[str, dict]]:
+    props = strip.id_properties_ensure().to_dict()
+    effects = parse_effects(props[sve.effect_store], offset) if sve.effect_store in props else []
+    names = {name for name, _ in effects}
+    for pp in props:
+        if sve.effect_pre in pp and pp[len(sve.effect_pre):] not in names:
+            parsed = parse_effect(props[pp], offset)
+            if parsed:
+                effects.append((pp[len(sve.effect_pre):], parsed))
+    return effects
+
 
 
 
@@ -133,6 +227,16 @@ class SVEEffects_CloseEditor(bpy.types.Operator):
     bl_idname = "sequencer.sveeffects_closeeditor"
     bl_label = "Save Changes"
     bl_options = {'REGISTER', 'UNDO'}
+    bake_noise: bpy.props.BoolProperty(
+        name="Bake Noise",
+        description="Replace the shake noise modifiers with sampled keyframes",
+        default=False,
+    )
+    noise_step: bpy.props.IntProperty(
+        name="Noise Step",
+        description="Frames between the noise samples",
+        min=1, default=1,
+    )
 
 
     @classmethod
@@ -163,9 +267,10 @@ class SVEEffects_CloseEditor(bpy.types.Operator):
             if pp[:len(sve.effect_pre)] == sve.effect_pre:
                 del G.orig_strip[pp]
 
-        for _, effect in effectC.all.items():
-            G.orig_strip[sve.effect_pre + effect.name] = stringify_effect(effect, G.orig_strip.frame_final_start)
+        G.orig_strip[sve.effect_store] = dump_effects(
+            list(effectC.all.values()) + list(effect_record.all.values()), G.orig_strip.frame_final_start)
 
+        # not sliced, the fcurves still queued are done here before they are copied
         fcurveC.recalc_all()
         
         for _, fcurve in fcurveC.all.items():
@@ -173,20 +278,15 @@ class SVEEffects_CloseEditor(bpy.types.Operator):
             fc_mod = fcurve.fcurve.modifiers
             data_path = get_from_path(G.orig_strip, fcurve.path, lambda base, prop: base.path_from_id(prop))
             ofcurve = G.action.fcurves.find( data_path )
-            if not ofcurve: ofcurve = G.action.fcurves.new( data_path )
+            if not ofcurve:
+                ofcurve = G.action.fcurves.new( data_path )
+                G.paths.add(G.edit_scene, 'fcurves', ofcurve)
             ofc_kfp = ofcurve.keyframe_points
             ofc_mod = ofcurve.modifiers
-            ofc_kfp.clear()
             for modf in list(ofc_mod):
                 ofc_mod.remove(modf)
 
-            ofc_kfp.add( len(fc_kfp) )
-
-            for ii in range(len(fc_kfp)):
-                ofc_kfp[ii].co = fc_kfp[ii].co
-                ofc_kfp[ii].handle_left = fc_kfp[ii].handle_left
-                ofc_kfp[ii].handle_right = fc_kfp[ii].handle_right
-            
+            keyframes_copy(fc_kfp, ofc_kfp)
             ofc_kfp.sort()
 
             for modf in fc_mod:
@@ -194,10 +294,14 @@ class SVEEffects_CloseEditor(bpy.types.Operator):
                 modifier_default(newmod, modf)
                 newmod.frame_start = modf.frame_start
                 newmod.frame_end = modf.frame_end
+            if self.bake_noise:
+                bake_noise(ofcurve, self.noise_step)
 
+        effect_record.clear()
         G.edit_strip = None
         G.orig_strip = None
         G.edit_scene = None
+        mark_session()
         bpy.msgbus.clear_by_owner(scene)
         for channel_name in ['Channel 1','Channel 2']:
             channel = scene.sequence_editor.channels[channel_name]
@@ -207,15 +311,11 @@ class SVEEffects_CloseEditor(bpy.types.Operator):
                 seq.select = True
                 scene.sequence_editor.active_strip = seq
             else:
-                for fc in list(scene.animation_data.drivers):
-                    if 'sequences_all["%s"]'%(seq.name) in fc.data_path:
-                        scene.animation_data.drivers.remove(fc)
+                G.paths.remove(scene, 'drivers', seq.name)
                 scene.sequence_editor.sequences.remove(seq)
+        G.handles.invalidate()
         
-
-        for fc in list(scene.animation_data.drivers):
-            if 'sequences_all["%s"]'%(scene.sequence_editor.active_strip.name) in fc.data_path:
-                scene.animation_data.drivers.remove(fc)
+        G.paths.remove(scene, 'drivers', scene.sequence_editor.active_strip.name)
 
         with context.temp_override(area=SEQUENCE_EDITOR):
             bpy.ops.sequencer.meta_separate()
@@ -231,7 +331,11 @@ class SVEEffects_OpenEditor(bpy.types.Operator):
     bl_idname = "sequencer.sveeffects_openeditor"
     bl_label = "Effects Editor"
     bl_options = {'REGISTER', 'UNDO'}
-
+    lazy: bpy.props.BoolProperty(
+        name="Lazy Effects",
+        description="Create effect strips only once they scroll into the timeline view",
+        default=False,
+    )
 
     @classmethod
     def poll(cls, context):
@@ -241,8 +345,17 @@ class SVEEffects_OpenEditor(bpy.types.Operator):
         return
 
     def execute(self, context):
-        effectC.all.clear()
+        # the edit strip is placed at the start of the active strip, the effects are read before anything changes
+        try:
+            stored = load_effects(context.active_sequence_strip, context.active_sequence_strip.frame_final_start)
+        except ValueError as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+
+        effectC.clear()
+        effect_record.clear()
         fcurveC.all.clear()
+        recalc_queue.clear()
         G.strips.clear()
 
         SEQUENCE_EDITOR = get_by_area("SEQUENCE_EDITOR")
@@ -275,9 +388,7 @@ class SVEEffects_OpenEditor(bpy.types.Operator):
             bpy.data.actions.new(G.edit_scene.name)
             G.edit_scene.animation_data.action = bpy.data.actions[G.edit_scene.name]
             
-        for fc in list(G.action.fcurves):
-            if '"%s"'%(G.orig_strip.name) in fc.data_path:
-                G.action.fcurves.remove(fc)
+        G.paths.remove(G.edit_scene, 'fcurves', G.orig_strip.name)
 
         for ppath in fcurve_paths:
             srcval = get_from_path(G.orig_strip, ppath, lambda base, prop: getattr(base, prop))
@@ -292,17 +403,17 @@ class SVEEffects_OpenEditor(bpy.types.Operator):
             G.edit_strip.select = True
             bpy.ops.sequencer.set_range_to_strips(preview=True)
 
-        props = G.orig_strip.id_properties_ensure().to_dict()
-        for pp in props:
-            if sve.effect_pre in pp:
-                parsed = parse_effect(props[pp], G.edit_strip.frame_final_start)
-                name = pp[len(sve.effect_pre):]
-                if parsed:
-                    effectC(name, G.edit_scene, parsed)
+        for name, parsed in stored:
+            if self.lazy:
+                effect_record(name, parsed)
+            else:
+                effectC(name, G.edit_scene, parsed)
+        store_effect_records()
                     
         G.edit_strip[sve.strip_source] = G.orig_strip.name
         G.edit_strip[sve.scene_source] = G.edit_scene.name
-        fcurveC.recalc_all()
+        mark_session(G.edit_scene.name, G.edit_strip.name)
+        fcurveC.recalc_all(sliced=True)
 
         for seq in G.edit_scene.sequence_editor.sequences:
             seq.select = False
@@ -339,6 +450,14 @@ class SVEEffects_Tester(bpy.types.Operator):
         printc(str(effectC.all))
         printc(str('fcurveC.all'))
         printc(str(fcurveC.all))
+        printc(str('recalc_queue'))
+        printc(str(recalc_queue.counters))
+        printc(str('handles'))
+        printc(str(G.handles.counters))
+        printc(str('paths'))
+        printc(str(G.paths.counters))
+        printc('modifiers written %d, skipped %d' % (fcurveC.modifier_written, fcurveC.modifier_skipped))
+        printc('evaluate hits %d, misses %d' % (fcurveC.evaluate_hits, fcurveC.evaluate_misses))
         return {'FINISHED'}
     
 class SVEEffects_AddEffect(bpy.types.Operator):
@@ -365,7 +484,7 @@ class SVEEffects_AddEffect(bpy.types.Operator):
         
         name = anim_base.all[self.effect_type].name
         effectC(name, context.scene, {'type': self.effect_type})
-        fcurveC.recalc_all()
+        fcurveC.recalc_all(sliced=True)
 
         return {'FINISHED'}
     
@@ -417,6 +536,80 @@ class SEQUENCER_PT_SVEEffects(bpy.types.Panel):
 
         effectT.layout(layout, effect)
 
+class SVEEffects_Profiler(bpy.types.Operator):
+    """Start, stop, reset or export the hot path profile"""
+    bl_idname = "sequencer.sveeffects_profiler"
+    bl_label = "Profiler"
+    bl_options = {'REGISTER'}
+    action: bpy.props.EnumProperty(
+        name="Action",
+        items=[
+            ('TOGGLE', "Start/Stop", ""),
+            ('RESET', "Reset", ""),
+            ('EXPORT', "Export", "Export to .json or .csv"),
+        ],
+        default='TOGGLE',
+    )
+    filepath: bpy.props.StringProperty(
+        name="File Path",
+        subtype='FILE_PATH',
+        default="sve_profile.csv",
+    )
+    filter_glob: bpy.props.StringProperty(
+        default="*.csv;*.json",
+        options={'HIDDEN'},
+    )
+
+    def invoke(self, context, event):
+        if self.action != 'EXPORT': return self.execute(context)
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+    def execute(self, context):
+        if self.action == 'TOGGLE':
+            profiler.enabled = not profiler.enabled
+        elif self.action == 'RESET':
+            profiler.clear()
+        elif self.action == 'EXPORT':
+            try:
+                profiler.export(bpy.path.abspath(self.filepath))
+            except OSError as e:
+                self.report({'ERROR'}, str(e))
+                return {'CANCELLED'}
+        return {'FINISHED'}
+
+class SEQUENCER_PT_SVEProfiler(bpy.types.Panel):
+    bl_label = "Effects Profiler"
+    bl_space_type = 'SEQUENCE_EDITOR'
+    bl_region_type = 'UI'
+    bl_category = "Strip"
+    bl_order = 1
+    bl_options = {'DEFAULT_CLOSED'}
+
+    @classmethod
+    def poll(cls, context):
+        return G.edit_strip != None
+
+    def draw(self, context):
+        layout = self.layout
+        row = layout.row(align=True)
+        row.operator(SVEEffects_Profiler.bl_idname, text="Stop" if profiler.enabled else "Start",
+                     icon='PAUSE' if profiler.enabled else 'PLAY').action = 'TOGGLE'
+        row.operator(SVEEffects_Profiler.bl_idname, text="Reset").action = 'RESET'
+        row.operator(SVEEffects_Profiler.bl_idname, text="Export").action = 'EXPORT'
+
+        rows = profiler.rows()
+        if len(rows) == 0: return
+        grid = layout.grid_flow(row_major=True, columns=5, even_columns=False, align=True)
+        for text in ['function', 'calls', 'total ms', 'max ms', 'writes']:
+            grid.label(text=text)
+        for row in rows:
+            grid.label(text=row['name'])
+            grid.label(text='%d' % row['calls'])
+            grid.label(text='%.2f' % row['total_ms'])
+            grid.label(text='%.2f' % row['max_ms'])
+            grid.label(text='%.1f' % row['writes_per_call'])
+
 
 class SEQUENCER_MT_SVEEffects_Menu(bpy.types.Menu):
     bl_idname = "SEQUENCER_MT_SVEEffects_Menu"
@@ -427,6 +620,8 @@ class SEQUENCER_MT_SVEEffects_Menu(bpy.types.Menu):
         layout = self.layout
         for tt in anim_base.all:
             layout.operator(SVEEffects_AddEffect.bl_idname, text = anim_base.all[tt].name).effect_type = tt
+        layout.separator()
+        layout.menu(G.SEQUENCER_MT_SVEEffects_Presets, text='Presets')
         # layout.operator(SVEEffects_Tester.bl_idname, text=SVEEffects_Tester.bl_label)
 
     @classmethod
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+import bpy
+import json
+from os import path, stat, makedirs, replace
+from .effect_fcurve import effectC, effect_record, fcurveC
+from .operators import effect_rows, parse_effect_rows, load_effects
+from .utility import selected_strips
+from .globals import G
+
+# a library is one json file {'version', 'index': {preset: summary}, 'presets': {preset: rows}},
+# rows are effect store rows relative to the preset start. the index is what the menus list.
+# libraries are read once and cached by path, a changed file is read again on the next access
+preset_version = 1
+
+class preset_library:
+    filepath: str
+    mtime: int
+    index: dict[str, dict]
+    presets: dict[str, list[list]]
+    parsed: dict[str, list[tuple[str, dict]]]
+    reads: int = 0
+
+    def __init__(self, filepath: str) -> None:
+        self.filepath = filepath
+        self.mtime = None
+        self.index = {}
+        self.presets = {}
+        self.parsed = {}
+
+    def modified(self) -> int | None:
+        try:
+            return stat(self.filepath).st_mtime_ns
+        except OSError:
+            return None
+
+    def load(self) -> 'preset_library':
+        mtime = self.modified()
+        if mtime == self.mtime: return self
+        self.mtime = mtime
+        self.index, self.presets, self.parsed = {}, {}, {}
+        if mtime == None: return self
+        with open(self.filepath) as file:
+            library = json.load(file)
+        if library.get('version') != preset_version:
+            raise ValueError('%s is not a version %d preset library' % (self.filepath, preset_version))
+        self.presets = library['presets']
+        self.index = library.get('index') or {name: self.summary(rows) for name, rows in self.presets.items()}
+        preset_library.reads += 1
+        return self
+
+    def save(self):
+        makedirs(path.dirname(self.filepath) or '.', exist_ok=True)
+        with open(self.filepath + '.tmp', 'w') as file:
+            json.dump({'version': preset_version, 'index': self.index, 'presets': self.presets},
+                      file, separators=(',', ':'))
+        replace(self.filepath + '.tmp', self.filepath)
+        self.mtime = self.modified()
+
+    @staticmethod
+    def summary(rows: list[list]) -> dict:
+        return {
+            'effects': len(rows),
+            'length': max((row[2] for row in rows), default=0),
+            'types': sorted({row[3] for row in rows}),
+        }
+
+    def add(self, name: str, effects: list[tuple[str, dict]]):
+        start = min(parsed['start'] for _, parsed in effects)
+        rows = [[effect_name, parsed['start'] - start, parsed['end'] - start, parsed['type'], parsed['props']]
+                for effect_name, parsed in effects]
+        self.presets[name] = rows
+        self.index[name] = self.summary(rows)
+        self.parsed.pop(name, None)
+
+    def remove(self, name: str):
+        self.presets.pop(name, None)
+        self.index.pop(name, None)
+        self.parsed.pop(name, None)
+
+    def merge(self, other: 'preset_library') -> int:
+        for name, rows in other.presets.items():
+            self.presets[name] = rows
+            self.index[name] = other.index.get(name) or self.summary(rows)
+            self.parsed.pop(name, None)
+        return len(other.presets)
+
+    # parsed once per preset, every call gets its own copy moved to offset
+    def effects(self, name: str, offset: int) -> list[tuple[str, dict]]:
+        parsed = self.parsed.get(name)
+        if parsed == None:
+            parsed = self.parsed[name] = parse_effect_rows(self.presets[name], 0)
+        return [(effect_name, {
+                    'start': effect['start'] + offset,
+                    'end': effect['end'] + offset,
+                    'type': effect['type'],
+                    'props': {prop: list(value) for prop, value in effect['props'].items()},
+                }) for effect_name, effect in parsed]
+
+    # batch specs, start/end relative to the strip start
+    def specs(self, name: str, offset: int) -> list[dict]:
+        return [dict(effect, name=effect_name) for effect_name, effect in self.effects(name, offset)]
+
+libraries: dict[str, preset_library] = {}
+
+def default_library() -> str:
+    return path.join(bpy.utils.user_resource('CONFIG'), 'sve_presets.json')
+
+def library(filepath: str = '') -> preset_library:
+    filepath = bpy.path.abspath(filepath) if filepath else default_library()
+    if filepath not in libraries:
+        libraries[filepath] = preset_library(filepath)
+    return libraries[filepath].load()
+
+
+class SVEEffects_PresetSave(bpy.types.Operator):
+    """Save the selected effects, all effects when none is selected, as a preset"""
+    bl_idname = "sequencer.sveeffects_presetsave"
+    bl_label = "Save Preset"
+    bl_options = {'REGISTER'}
+    name: bpy.props.StringProperty(
+        name="Name",
+        default="Preset",
+    )
+    filepath: bpy.props.StringProperty(
+        name="Library",
+        description="Preset library, the user config library when empty",
+        subtype='FILE_PATH',
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return G.edit_strip != None or context.active_sequence_strip
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        if G.edit_strip != None:
+            effects = [effectC.all[strip.name] for strip in selected_strips(context) or [] if strip.name in effectC.all]
+            if len(effects) == 0:
+                effects = list(effectC.all.values()) + list(effect_record.all.values())
+            effects = parse_effect_rows(effect_rows(effects, 0), 0)
+        else:
+            try:
+                effects = load_effects(context.active_sequence_strip, 0)
+            except ValueError as e:
+                self.report({'ERROR'}, str(e))
+                return {'CANCELLED'}
+        if len(effects) == 0:
+            self.report({'WARNING'}, 'no effects to save')
+            return {'CANCELLED'}
+        try:
+            presets = library(self.filepath)
+            presets.add(self.name, effects)
+            presets.save()
+        except (OSError, ValueError) as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+        return {'FINISHED'}
+
+class SVEEffects_PresetApply(bpy.types.Operator):
+    """Add the preset's effects at the playhead, or to every selected strip when the editor is closed"""
+    bl_idname = "sequencer.sveeffects_presetapply"
+    bl_label = "Apply Preset"
+    bl_options = {'REGISTER', 'UNDO'}
+    name: bpy.props.StringProperty(
+        name="Name",
+    )
+    filepath: bpy.props.StringProperty(
+        name="Library",
+        description="Preset library, the user config library when empty",
+        subtype='FILE_PATH',
+    )
+    at_playhead: bpy.props.BoolProperty(
+        name="At Playhead",
+        description="Start the preset at the playhead instead of the start of each strip",
+        default=False,
+    )
+
+    @classmethod
+    def poll(cls, context):
+        if G.edit_strip != None: return G.edit_scene == context.scene
+        return context.scene.sequence_editor != None
+
+    def execute(self, context):
+        try:
+            presets = library(self.filepath)
+        except (OSError, ValueError) as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+        if self.name not in presets.presets:
+            self.report({'ERROR'}, 'no preset %r in %s' % (self.name, presets.filepath))
+            return {'CANCELLED'}
+
+        scene = context.scene
+        if G.edit_strip != None:
+            for sequence in scene.sequence_editor.sequences:
+                sequence.select = False
+            for name, parsed in presets.effects(self.name, scene.frame_current):
+                effectC(name, scene, parsed)
+            fcurveC.recalc_all(sliced=True)
+            return {'FINISHED'}
+
+        # closed editor, the strips are baked in one pass by the batch path, in blender's process
+        from .batch import bake_manifest
+        sequences = scene.sequence_editor.sequences
+        strips = [strip for strip in selected_strips(context) or [] if strip.name in sequences]
+        if len(strips) == 0:
+            self.report({'WARNING'}, 'no strips selected')
+            return {'CANCELLED'}
+        manifest = {'scene': scene.name, 'strips': {
+            strip.name: presets.specs(self.name, scene.frame_current - strip.frame_final_start if self.at_playhead else 0)
+            for strip in strips}}
+        try:
+            applied = bake_manifest(manifest, workers=1)
+        except (KeyError, ValueError, RuntimeError) as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+        self.report({'INFO'}, '%s applied to %d strips' % (self.name, len(applied)))
+        return {'FINISHED'}
+
+class SVEEffects_PresetTransfer(bpy.types.Operator):
+    """Import the presets of another library, or export this library to a file"""
+    bl_idname = "sequencer.sveeffects_presettransfer"
+    bl_label = "Transfer Presets"
+    bl_options = {'REGISTER'}
+    action: bpy.props.EnumProperty(
+        name="Action",
+        items=[
+            ('IMPORT', "Import", "Add the presets of a library, presets with the same name are replaced"),
+            ('EXPORT', "Export", "Write the library to a file"),
+        ],
+        default='IMPORT',
+    )
+    filepath: bpy.props.StringProperty(
+        name="File Path",
+        subtype='FILE_PATH',
+        default="sve_presets.json",
+    )
+    filter_glob: bpy.props.StringProperty(
+        default="*.json",
+        options={'HIDDEN'},
+    )
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+    def execute(self, context):
+        try:
+            presets = library()
+            if self.action == 'IMPORT':
+                count = presets.merge(library(self.filepath))
+                presets.save()
+                self.report({'INFO'}, '%d presets imported' % count)
+            else:
+                exported = preset_library(bpy.path.abspath(self.filepath))
+                exported.merge(presets)
+                exported.save()
+        except (OSError, ValueError) as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+        return {'FINISHED'}
+
+class SEQUENCER_MT_SVEEffects_Presets(bpy.types.Menu):
+    bl_idname = G.SEQUENCER_MT_SVEEffects_Presets
+    bl_label = "Effect Presets"
+
+    def draw(self, context):
+        layout = self.layout
+        try:
+            presets = library()
+        except (OSError, ValueError) as e:
+            layout.label(text=str(e), icon='ERROR')
+            presets = None
+        if presets:
+            for name, summary in presets.index.items():
+                layout.operator(SVEEffects_PresetApply.bl_idname,
+                                text='%s (%d)' % (name, summary['effects'])).name = name
+            if presets.index: layout.separator()
+        layout.operator(SVEEffects_PresetSave.bl_idname, text='Save Preset...')
+        layout.operator(SVEEffects_PresetTransfer.bl_idname, text='Import...').action = 'IMPORT'
+        layout.operator(SVEEffects_PresetTransfer.bl_idname, text='Export...').action = 'EXPORT'
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+import csv
+import json
+from functools import wraps
+from time import perf_counter
+from typing import Callable
+
+# opt-in timing of the hot paths, while disabled a timed function only costs the enabled check.
+# times are inclusive, a timed function called from another one counts in both
+class profiler:
+    enabled: bool = False
+    stats: dict[str, list]
+    stack: list[list]
+    columns = ('name', 'calls', 'total_ms', 'mean_ms', 'max_ms', 'rna_writes', 'writes_per_call')
+
+    def __init__(self) -> None:
+        self.stats = {}
+        self.stack = []
+
+    def timed(self, call: Callable):
+        name = call.__qualname__
+        @wraps(call)
+        def timed_call(*args, **kwargs):
+            if not self.enabled: return call(*args, **kwargs)
+            # calls, total time, max time, rna writes
+            stat = self.stats.get(name)
+            if stat == None:
+                stat = self.stats[name] = [0, 0.0, 0.0, 0]
+            self.stack.append(stat)
+            tt = perf_counter()
+            try:
+                return call(*args, **kwargs)
+            finally:
+                tt = perf_counter() - tt
+                self.stack.pop()
+                stat[0] += 1
+                stat[1] += tt
+                if tt > stat[2]: stat[2] = tt
+        return timed_call
+
+    # rna writes are counted for the innermost running timed function
+    def write(self, count: int = 1):
+        if self.stack: self.stack[-1][3] += count
+
+    def clear(self):
+        self.stats.clear()
+
+    def rows(self) -> list[dict]:
+        rows = []
+        for name, (calls, total, tmax, writes) in self.stats.items():
+            rows.append(dict(zip(self.columns, (
+                name, calls, total * 1000.0, total * 1000.0 / calls if calls else 0.0,
+                tmax * 1000.0, writes, writes / calls if calls else 0.0))))
+        rows.sort(key=lambda row: row['total_ms'], reverse=True)
+        return rows
+
+    def export(self, filepath: str):
+        rows = self.rows()
+        with open(filepath, 'w', newline='') as file:
+            if filepath.lower().endswith('.json'):
+                json.dump(rows, file, indent=1)
+            else:
+                writer = csv.DictWriter(file, fieldnames=self.columns)
+                writer.writeheader()
+                writer.writerows(rows)
+profiler = profiler()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+import bpy
+from typing import Callable
+from .globals import G
+from .profiler import profiler
+
+# dirty-flag scheduler, handlers only mark what changed and the checks run
+# at most once per event loop tick from a timer
+class scheduler:
+    checks: dict[str, Callable]
+    dirty: set[str]
+    poll_interval: float = 0.05
+
+    def __init__(self) -> None:
+        self.checks = {}
+        self.dirty = set()
+        self._flush = self.flush
+
+    def add_check(self, flag: str, check: Callable):
+        self.checks[flag] = check
+
+    def mark(self, *flags: str):
+        self.dirty.update(flags)
+        if not bpy.app.timers.is_registered(self._flush):
+            bpy.app.timers.register(self._flush, first_interval=0.0, persistent=False)
+
+    def clear(self):
+        self.dirty.clear()
+        if bpy.app.timers.is_registered(self._flush):
+            bpy.app.timers.unregister(self._flush)
+
+    @staticmethod
+    def edit_window():
+        for window in bpy.context.window_manager.windows:
+            if window.scene == G.edit_scene: return window
+        return None
+
+    # checks returning True are still pending (a modal operator is running) and get polled again
+    @profiler.timed
+    def flush(self):
+        window = self.edit_window() if G.edit_strip != None else None
+        if window == None:
+            self.dirty.clear()
+            return None
+
+        # flags marked by an earlier check are handled by the later checks in the same tick
+        pending: set[str] = set()
+        with bpy.context.temp_override(window=window):
+            for flag, check in self.checks.items():
+                if flag not in self.dirty: continue
+                self.dirty.discard(flag)
+                if check(): pending.add(flag)
+        self.dirty.update(pending)
+        return self.poll_interval if self.dirty else None
+scheduler = scheduler()
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+
+# fcurve math without bpy, also imported as a top level module by the bake workers
+import math
+import importlib
+from heapq import heappush, heappop
+
+# numpy takes most of the addon's import time, it is imported on the first attribute access.
+# after that the module's names are copied in and looked up like any attribute
+class lazy_module:
+    def __init__(self, name: str) -> None:
+        self.__dict__['_name'] = name
+
+    def __getattr__(self, attr: str):
+        module = self.__dict__.get('_module')
+        if module == None:
+            module = self.__dict__['_module'] = importlib.import_module(self._name)
+            self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+    @property
+    def loaded(self) -> bool:
+        return '_module' in self.__dict__
+np = lazy_module('numpy')
+
+def sqrt3d(dd: float) -> float:
+    if dd == 0.0: return 0.0
+    return math.copysign(1.0 ,dd) * math.exp(math.log(abs(dd)) / 3.0)
+
+def solve_cubic(c0: float, c1: float, c2: float, c3: float) -> tuple[int, list[float]]:
+    o: list[float] = [0.0] * 5
+    
+    nr: int = 0
+    floatsmall: float = -1.0e-10
+    floatone: float = 1.000001
+
+    if (c3 != 0.0):
+        a = c2 / c3
+        b = c1 / c3
+        c = c0 / c3
+        a = a / 3
+
+        p = b / 3 - a * a
+        q = (2 * a * a * a - a * b + c) / 2
+        d = q * q + p * p * p
+
+        if (d > 0.0):
+            t = math.sqrt(d)
+            o[0] = float(sqrt3d(-q + t) + sqrt3d(-q - t) - a)
+
+            if ((o[0] >= floatsmall) and (o[0] <= floatone)):
+                return 1, o
+            return 0, o
+        
+        if (d == 0.0):
+            t = sqrt3d(-q)
+            o[0] = float(2 * t - a)
+
+            if ((o[0] >= floatsmall) and (o[0] <= floatone)):
+                nr += 1
+            
+            o[nr] = float(-t - a)
+
+            if ((o[nr] >= floatsmall) and (o[nr] <= floatone)):
+                return nr + 1, o
+            return nr, o
+
+        phi = math.acos(-q / math.sqrt(-(p * p * p)))
+        t = math.sqrt(-p)
+        p = math.cos(phi / 3)
+        q = math.sqrt(3 - 3 * p * p)
+        o[0] = float(2 * t * p - a)
+
+        if ((o[0] >= floatsmall) and (o[0] <= floatone)):
+            nr += 1
+        o[nr] = float(-t * (p + q) - a)
+
+        if ((o[nr] >= floatsmall) and (o[nr] <= floatone)):
+            nr += 1
+        o[nr] = float(-t * (p - q) - a)
+
+        if ((o[nr] >= floatsmall) and (o[nr] <= floatone)):
+            return nr + 1, o
+        return nr, o
+    a = c2
+    b = c1
+    c = c0
+
+    if (a != 0.0):
+        # /* Discriminant */
+        p = b * b - 4 * a * c;
+
+        if (p > 0):
+            p = math.sqrt(p);
+            o[0] = float((-b - p) / (2 * a));
+
+            if ((o[0] >= floatsmall) and (o[0] <= floatone)):
+                nr += 1
+            o[nr] = float((-b + p) / (2 * a));
+
+            if ((o[nr] >= floatsmall) and (o[nr] <= floatone)):
+                return nr + 1, o
+            return nr, o
+
+        if (p == 0):
+            o[0] = float(-b / (2 * a));
+            if ((o[0] >= floatsmall) and (o[0] <= floatone)):
+                return 1, o
+        return 0, o
+
+    if (b != 0.0):
+        o[0] = float(-c / b);
+
+        if ((o[0] >= floatsmall) and (o[0] <= floatone)):
+            return 1, o
+        return 0, o
+
+    if (c == 0.0):
+        o[0] = 0.0
+        return 1, o
+    return 0, o
+
+def berekeny(f1: float, f2: float, f3: float, f4: float, o: list[float]):
+    c0 = f1
+    c1 = 3.0 * (f2 - f1)
+    c2 = 3.0 * (f1 - 2.0 * f2 + f3)
+    c3 = f4 - f1 + 3.0 * (f2 - f3)
+    return c0 + o[0] * c1 + o[0] * o[0] * c2 + o[0] * o[0] * o[0] * c3
+
+def findzero(x, q0, q1, q2, q3):
+    c0 = q0 - x
+    c1 = 3.0 * (q1 - q0)
+    c2 = 3.0 * (q0 - 2.0 * q1 + q2)
+    c3 = q3 - q0 + 3.0 * (q1 - q2)
+
+    return solve_cubic(c0, c1, c2, c3)
+
+def calc_bezier(v1, v2, v3, v4, point) -> float:
+    # # /* Bezier interpolation. */
+    # # /* (v1, v2) are the first keyframe and its 2nd handle. */
+    # v1[0] = prevbezt->vec[1][0];
+    # v1[1] = prevbezt->vec[1][1];
+    # v2[0] = prevbezt->vec[2][0];
+    # v2[1] = prevbezt->vec[2][1];
+    # # /* (v3, v4) are the last keyframe's 1st handle + the last keyframe. */
+    # v3[0] = bezt->vec[0][0];
+    # v3[1] = bezt->vec[0][1];
+    # v4[0] = bezt->vec[1][0];
+    # v4[1] = bezt->vec[1][1];
+
+    # /* Try to get a value for this position - if failure, try another set of points. */
+    zero, opl = findzero(point, v1[0], v2[0], v3[0], v4[0])
+    if zero == 0: 
+        return 0.0
+    else:
+        return berekeny(v1[1], v2[1], v3[1], v4[1], opl)
+
+# vectorized calc_bezier, v1..v4 are (..., 2) arrays of control points and point the frames to solve.
+# broadcasting allows many points on one segment or one point per segment, roots are picked
+# in the same order as solve_cubic so the results match the scalar path.
+def calc_bezier_batch(v1, v2, v3, v4, point) -> 'np.ndarray':
+    v1, v2, v3, v4 = (np.asarray(vv, dtype=np.float64) for vv in (v1, v2, v3, v4))
+    x = np.asarray(point, dtype=np.float64)
+    roots, found = findzero_batch(x, v1[..., 0], v2[..., 0], v3[..., 0], v4[..., 0])
+    values = berekeny_batch(v1[..., 1], v2[..., 1], v3[..., 1], v4[..., 1], roots)
+    return np.where(found, values, 0.0)
+
+def sqrt3d_batch(dd: 'np.ndarray') -> 'np.ndarray':
+    with np.errstate(divide='ignore'):
+        return np.where(dd == 0.0, 0.0, np.copysign(1.0, dd) * np.exp(np.log(np.abs(dd)) / 3.0))
+
+def berekeny_batch(f1, f2, f3, f4, o: 'np.ndarray') -> 'np.ndarray':
+    c0 = f1
+    c1 = 3.0 * (f2 - f1)
+    c2 = 3.0 * (f1 - 2.0 * f2 + f3)
+    c3 = f4 - f1 + 3.0 * (f2 - f3)
+    return c0 + o * c1 + o * o * c2 + o * o * o * c3
+
+def findzero_batch(x, q0, q1, q2, q3) -> 'tuple[np.ndarray, np.ndarray]':
+    c0 = q0 - x
+    c1 = 3.0 * (q1 - q0)
+    c2 = 3.0 * (q0 - 2.0 * q1 + q2)
+    c3 = q3 - q0 + 3.0 * (q1 - q2)
+
+    return solve_cubic_batch(*np.broadcast_arrays(c0, c1, c2, c3))
+
+def solve_cubic_batch(c0, c1, c2, c3) -> 'tuple[np.ndarray, np.ndarray]':
+    floatsmall: float = -1.0e-10
+    floatone: float = 1.000001
+
+    root = np.zeros(c0.shape)
+    found = np.zeros(c0.shape, dtype=bool)
+
+    # first root in range wins, same order as solve_cubic
+    def pick(mask, candidate):
+        valid = mask & ~found & (candidate >= floatsmall) & (candidate <= floatone)
+        root[valid] = candidate[valid]
+        found[valid] = True
+
+    with np.errstate(all='ignore'):
+        cubic = c3 != 0.0
+        a = c2 / c3 / 3
+        b = c1 / c3
+        c = c0 / c3
+
+        p = b / 3 - a * a
+        q = (2 * a * a * a - a * b + c) / 2
+        d = q * q + p * p * p
+
+        t = np.sqrt(d)
+        pick(cubic & (d > 0.0), sqrt3d_batch(-q + t) + sqrt3d_batch(-q - t) - a)
+
+        t = sqrt3d_batch(-q)
+        pick(cubic & (d == 0.0), 2 * t - a)
+        pick(cubic & (d == 0.0), -t - a)
+
+        phi = np.arccos(np.clip(-q / np.sqrt(-(p * p * p)), -1.0, 1.0))
+        t = np.sqrt(-p)
+        p = np.cos(phi / 3)
+        q = np.sqrt(3 - 3 * p * p)
+        three = cubic & (d < 0.0)
+        pick(three, 2 * t * p - a)
+        pick(three, -t * (p + q) - a)
+        pick(three, -t * (p - q) - a)
+
+        a = c2
+        b = c1
+        c = c0
+        quadratic = ~cubic & (a != 0.0)
+        p = b * b - 4 * a * c
+        sp = np.sqrt(p)
+        pick(quadratic & (p > 0), (-b - sp) / (2 * a))
+        pick(quadratic & (p > 0), (-b + sp) / (2 * a))
+        pick(quadratic & (p == 0), -b / (2 * a))
+
+        linear = ~cubic & (a == 0.0) & (b != 0.0)
+        pick(linear, -c / b)
+
+        constant = ~cubic & (a == 0.0) & (b == 0.0) & (c == 0.0)
+        root[constant] = 0.0
+        found[constant] = True
+
+    return root, found
+
+# rangeC.interpolate for arrays, the bezier of an effect eases over at most 5 frames at each end
+def interpolate_batch(start_f, end_f, start_val, end_val, point) -> 'np.ndarray':
+    start_f, end_f, start_val, end_val, point = np.broadcast_arrays(
+        *(np.asarray(aa, dtype=np.float64) for aa in (start_f, end_f, start_val, end_val, point)))
+    diff = np.minimum(end_f - start_f, 5.0)
+
+    v1 = np.stack([start_f       , start_val], axis=-1)
+    v2 = np.stack([start_f + diff, start_val], axis=-1)
+    v3 = np.stack([end_f   - diff, end_val  ], axis=-1)
+    v4 = np.stack([end_f         , end_val  ], axis=-1)
+
+    values = calc_bezier_batch(v1, v2, v3, v4, point)
+    values = np.where(start_val == end_val, start_val, values)
+    values = np.where(point == end_f, end_val, values)
+    return np.where(point == start_f, start_val, values)
+
+# the ranges overlapping a range contribute at its frames, swept by start with a heap of the active ends.
+# returns the (range, frame) pairs, a range's own start/end are left out
+def overlap_points(starts: 'np.ndarray', ends: 'np.ndarray') -> 'tuple[np.ndarray, np.ndarray]':
+    index: list[int] = []
+    frames: list[int] = []
+    active: list[tuple[int, int]] = []
+    for ii in range(len(starts)):
+        start1, end1 = starts[ii], ends[ii]
+        while active and active[0][0] < start1:
+            heappop(active)
+        for end0, i0 in active:
+            index.append(i0)
+            frames.append(start1)
+            if end1 <= end0:
+                index.append(i0)
+                frames.append(end1)
+            else:
+                index.append(ii)
+                frames.append(end0)
+        heappush(active, (end1, ii))
+
+    if len(index) == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.int64)
+    index = np.array(index, dtype=np.intp)
+    frames = np.array(frames, dtype=np.int64)
+    own = (frames == starts[index]) | (frames == ends[index])
+    index, frames = index[~own], frames[~own]
+    if len(index) == 0:
+        return index, frames
+    # unique (range, frame) pairs as one int64 key, sorted by range then frame
+    low = frames.min()
+    span = frames.max() - low + 1
+    keys = np.unique(index.astype(np.int64) * span + (frames - low))
+    return (keys // span).astype(np.intp), keys % span + low
+
+# final keyframes of one fcurve from its effect ranges (start, end, start value, end value),
+# the sum of every range's value at every keyed frame like fcurveC.keyframes_value_recalc
+def bake_ranges(starts, ends, start_vals, end_vals) -> 'tuple[np.ndarray, np.ndarray]':
+    columns, index, points = bake_points(starts, ends, start_vals, end_vals)
+    return bake_sum(columns, points, interpolate_batch(*(column[index] for column in columns), points))
+
+def bake_points(*columns) -> 'tuple[list[np.ndarray], np.ndarray, np.ndarray]':
+    starts, ends, start_vals, end_vals = (np.asarray(column, dtype=dtype) for column, dtype in zip(
+        columns, (np.int64, np.int64, np.float64, np.float64)))
+    order = np.lexsort((ends, starts))
+    columns = [starts[order], ends[order], start_vals[order], end_vals[order]]
+    index, points = overlap_points(columns[0], columns[1])
+    return columns, index, points
+
+def bake_sum(columns: 'list[np.ndarray]', points: 'np.ndarray', values: 'np.ndarray') -> 'tuple[np.ndarray, np.ndarray]':
+    starts, ends, start_vals, end_vals = columns
+    keys, inverse = np.unique(np.concatenate([starts, ends, points]), return_inverse=True)
+    sums = np.bincount(inverse, weights=np.concatenate([start_vals, end_vals, values]), minlength=len(keys))
+    return keys, sums
+
+# worker entry, task is (strip name, {sve_path: (starts, ends, start values, end values)}).
+# the overlap frames of all fcurves are interpolated in one call, small arrays are all overhead.
+# returns the interleaved float32 co arrays ready for keyframe_points.foreach_set
+def bake_strip(task: tuple[str, dict]) -> 'tuple[str, dict[str, np.ndarray]]':
+    name, ranges = task
+    prepared = [bake_points(*columns) for columns in ranges.values()]
+    values = interpolate_batch(
+        *(np.concatenate([columns[ii][index] for columns, index, _ in prepared] + [np.empty(0)]) for ii in range(4)),
+        np.concatenate([points for _, _, points in prepared] + [np.empty(0)]))
+
+    baked: dict[str, np.ndarray] = {}
+    offset = 0
+    for sve_path, (columns, index, points) in zip(ranges, prepared):
+        keys, sums = bake_sum(columns, points, values[offset:offset + len(points)])
+        offset += len(points)
+        co = np.empty(len(keys) * 2, dtype=np.float32)
+        co[0::2] = keys
+        co[1::2] = sums
+        baked[sve_path] = co
+    return name, baked
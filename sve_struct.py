@@ -5,7 +5,7 @@ import re
 from typing import Callable
 from .utility import get_from_path, add_driver, remove_driver,  create_none_img
 from .globals import G
-from math import radians
+from math import radians, isclose
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -90,6 +90,30 @@ class modifier_default:
                 setattr(modifier, pp, getattr(def_props, pp, default) )
             for pp, default in self._type[_type].items():
                 setattr(modifier, pp, getattr(def_props, pp, default) )
+
+    # like __call__ with a dict but only writes the properties that differ, returns (written, skipped)
+    def sync(self, modifier, def_props: dict) -> tuple[int, int]:
+        _type = def_props.get('type', 'NULL')
+        if _type not in self._type: return 0, 0
+        written, skipped = 0, 0
+        for props in [self.base, self._type[_type]]:
+            for pp, default in props.items():
+                value = def_props.get(pp, default)
+                if self.equal(getattr(modifier, pp), value):
+                    skipped += 1
+                else:
+                    setattr(modifier, pp, value)
+                    written += 1
+        return written, skipped
+
+    # rna floats are single precision, a value that only differs by that is not written again
+    @staticmethod
+    def equal(current, value) -> bool:
+        if isinstance(value, float):
+            return isclose(current, value, rel_tol=1e-6, abs_tol=1e-9)
+        if isinstance(value, (list, tuple)):
+            return len(current) == len(value) and all(modifier_default.equal(cc, vv) for cc, vv in zip(current, value))
+        return current == value
             
 modifier_default = modifier_default()
 
@@ -189,8 +213,10 @@ class sve:
     noise_seed = 'noise_seed'
 
     effect_pre = 'sveeffect_'
+    effect_store = 'sveeffects'
     strip_source = 'strip_source'
     scene_source = 'scene_source'
+    session = 'svesession'
     type = 'type'
     prop_use: list[str]
     prop_path: list[str]
@@ -319,12 +345,19 @@ class anim_base:
             return get_from_path(G.edit_strip, sve.props[_type].path, lambda base, prop: getattr(base, prop) )
         return None
     
+    # the props written to the effect store, to_string and to_dict both follow it
+    def stored_props(self, effect: 'effectC') -> list[str]:
+        return self.props
+
     def to_string(self, effect: 'effectC') -> str:
         string = ''
-        for prop in self.props:
+        for prop in self.stored_props(effect):
             string += prop + ':' + sve.props[prop].atype.getter_to_str(effect, prop) + ';'
         return string
     
+    def to_dict(self, effect: 'effectC') -> dict[str, list]:
+        return {prop: list(sve.props[prop].atype.getter(effect, prop)) for prop in self.stored_props(effect)}
+
     def parse(self, string: str) -> dict:
         rprop = r"(?P<prop>\w+):(?P<value>[^;]*);"
         dd = {}
@@ -351,7 +384,7 @@ class anim_base:
         def prop_change(effect: 'effectC', value):
             for fc in effect.fcurves:
                 if fc.sve_path == prop:
-                    fc.frame_recalc()
+                    fc.recalc_request('frame')
         return prop_change
 
 
@@ -395,14 +428,12 @@ class anim_transform(anim_base):
             sve.rotation: self.sve_prop_change(sve.rotation), 
         }
     
-    def to_string(self, effect: 'effectC') -> str:
-        string = ''
+    def stored_props(self, effect: 'effectC') -> list[str]:
+        props = []
         for use in [sve.use_offset, sve.use_scale, sve.use_rotation]:
-            string += use + ':' + sve.props[use].atype.getter_to_str(effect, use) + ';'
-            if effect.effect[use]:
-                for prop in sve.props[use].use:
-                    string += prop + ':' + sve.props[prop].atype.getter_to_str(effect, prop) + ';'
-        return string
+            props.append(use)
+            if effect.effect[use]: props += sve.props[use].use
+        return props
     def layout(self, layout, effect):
 
         layout_prop = {
@@ -492,7 +523,7 @@ class anim_shake(anim_base):
             return updater
         def update(effect: 'effectC', value):
             for fc in effect.fcurves:
-                fc.modifiers_value_recalc()
+                fc.recalc_request('modifiers')
 
         self.prop_update = {
             sve.use_offset: sve_use_update(sve.use_offset),
@@ -563,7 +594,7 @@ class anim_shake_rotation(anim_base):
             return updater
         def update(effect: 'effectC', value):
             for fc in effect.fcurves:
-                fc.modifiers_value_recalc()
+                fc.recalc_request('modifiers')
 
         self.prop_update = {
             sve.use_rotation: sve_use_update(sve.use_rotation),
@@ -4,19 +4,22 @@ import bpy
 import math
 from traceback import format_exc
 from typing import Callable
-from os import path, makedirs
+from os import path, makedirs, replace
+from struct import pack
+from zlib import compressobj, crc32
 from .globals import G
+from .sve_math import np
+
+# selected_sequences is selected_strips since blender 4.4
+def selected_strips(context) -> list:
+    if hasattr(context, 'selected_strips'): return context.selected_strips
+    return context.selected_sequences
 
 def get_by_area(type):
     for a in bpy.context.screen.areas: 
         if a.type == type: return a
     return None
 
-def dorot(p1, p2, rota):
-    at = math.atan( (p1/p2) if p2 != 0 else math.inf) - rota + (0.0 if p2 > 0.0 else math.pi)
-    length = math.sqrt(p1**2 + p2**2)
-    return length * math.sin(at), length * math.cos(at)
-    
 def printc(*args, **kwargs):
     area = get_by_area('CONSOLE')
     if area:
@@ -102,6 +105,7 @@ def try_def(call: Callable):
 def add_driver(effect, driver_path: list, data_path: list):
     drivers = get_from_path(effect, driver_path, lambda base, prop: base.driver_add( prop )) 
     dpath = get_from_path(G.edit_strip, data_path, lambda base, prop: base.path_from_id( prop )) 
+    G.paths.add(effect.id_data, 'drivers', *(drivers if isinstance(drivers, list) else [drivers]))
     if isinstance(drivers, list):
         for index, fc in enumerate(drivers):
             fc.driver.type = 'AVERAGE'
@@ -126,7 +130,10 @@ def add_driver(effect, driver_path: list, data_path: list):
 
 
 def remove_driver(effect, driver_path: list):
-    get_from_path(effect, driver_path, lambda base, prop: base.driver_remove( prop ))
+    def remove(base, prop):
+        base.driver_remove( prop )
+        G.paths.discard(effect.id_data, 'drivers', base.path_from_id( prop ))
+    get_from_path(effect, driver_path, remove)
 
 def create_none_img(srcstrip = None):
     strip = srcstrip if srcstrip != None else G.edit_strip
@@ -142,13 +149,92 @@ def create_none_img(srcstrip = None):
     makedirs(G.dir_temp, exist_ok=True)
     filepath = '%s/%s'%(G.dir_temp, filename)
     if not path.exists(filepath):
-        img = bpy.data.images.new(filename, w_img, h_img, alpha=True)
-        img.filepath = filepath
-        img.pixels = [0.0] * w_img * h_img * 4
-        img.update()
-        img.save()
+        write_none_png(filepath + '.tmp', w_img, h_img)
+        replace(filepath + '.tmp', filepath)
     return filepath
 
+# transparent RGBA png written straight to disk, the same zero row is fed to zlib for every line
+def write_none_png(filepath: str, width: int, height: int):
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return pack('>I', len(data)) + tag + data + pack('>I', crc32(tag + data))
+
+    row = bytes(1 + width * 4)
+    compressor = compressobj()
+    idat = b''.join([compressor.compress(row) for _ in range(height)]) + compressor.flush()
+
+    with open(filepath, 'wb') as file:
+        file.write(b'\x89PNG\r\n\x1a\n')
+        file.write(chunk(b'IHDR', pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)))
+        file.write(chunk(b'IDAT', idat))
+        file.write(chunk(b'IEND', b''))
+
+# keyframe_points store floats, foreach_get/set into matching float32 buffers take the fast path
+def keyframes_get(keyframe_points, attr: str = 'co') -> 'np.ndarray':
+    buffer = np.empty(len(keyframe_points) * 2, dtype=np.float32)
+    keyframe_points.foreach_get(attr, buffer)
+    return buffer
+
+def keyframes_set(keyframe_points, attr: str, buffer):
+    keyframe_points.foreach_set(attr, np.ascontiguousarray(buffer, dtype=np.float32))
+
+# replaces the points with interleaved co, handles 5 frames out like fcurveC writes them
+def keyframes_from_co(keyframe_points, co: 'np.ndarray'):
+    if len(keyframe_points) > 0: keyframe_points.clear()
+    keyframe_points.add(len(co) // 2)
+    keyframes_set(keyframe_points, 'co', co)
+    handle = np.array(co, dtype=np.float32)
+    handle[0::2] = co[0::2] - 5.0
+    keyframes_set(keyframe_points, 'handle_left', handle)
+    handle[0::2] = co[0::2] + 5.0
+    keyframes_set(keyframe_points, 'handle_right', handle)
+
+# samples the NOISE modifiers of an fcurve into LINEAR keyframes every step frames and removes them.
+# blender's noise tables are not exposed to python, fcurve.evaluate gives the modifier's exact values
+# at the samples. the sampling spans from the key before to the key after each modifier range, so
+# the curve between the other keys keeps its shape
+def bake_noise(fcurve, step: int = 1) -> int:
+    noises = [modifier for modifier in fcurve.modifiers if modifier.type == 'NOISE']
+    if len(noises) == 0: return 0
+    step = max(1, int(step))
+    co = keyframes_get(fcurve.keyframe_points).reshape(-1, 2)
+    keys = co[:, 0]
+
+    spans = []
+    for modifier in noises:
+        start, end = math.floor(modifier.frame_start), math.ceil(modifier.frame_end)
+        before, after = keys[keys <= start], keys[keys >= end]
+        spans.append((before.max() if len(before) else start, after.min() if len(after) else end))
+    inside = np.zeros(len(keys), dtype=bool)
+    for start, end in spans:
+        inside |= (keys > start) & (keys < end)
+    kept = co[~inside]
+
+    # the keys inside a span are replaced, a sample lands on their frame as well
+    frames = np.unique(np.concatenate([np.append(np.arange(start, end, step), end) for start, end in spans]))
+    frames = frames[~np.isin(frames, kept[:, 0])]
+    samples = np.empty((len(frames), 2), dtype=np.float32)
+    samples[:, 0] = frames
+    samples[:, 1] = [fcurve.evaluate(frame) for frame in frames.tolist()]
+    for modifier in noises:
+        fcurve.modifiers.remove(modifier)
+
+    merged = np.concatenate([kept, samples])
+    order = np.argsort(merged[:, 0], kind='stable')
+    keyframes_from_co(fcurve.keyframe_points, merged[order].reshape(-1))
+
+    # the samples and the keys starting a sampled span are linear
+    linear = (order >= len(kept)) | np.isin(merged[order, 0], [start for start, _ in spans])
+    for point, is_linear in zip(fcurve.keyframe_points, linear.tolist()):
+        if is_linear: point.interpolation = 'LINEAR'
+    fcurve.keyframe_points.sort()
+    return len(frames)
+
+def keyframes_copy(source_points, target_points):
+    if len(target_points) > 0: target_points.clear()
+    target_points.add(len(source_points))
+    for attr in ['co', 'handle_left', 'handle_right']:
+        keyframes_set(target_points, attr, keyframes_get(source_points, attr))
+
 class change_checker():
     old_value = None
     def __init__(self, old_value=None) -> None: